@@ -1,15 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from config import APP_MODE, MODEL_WARMUP
 from database import engine
 from models import Base
+from services.admission import Overloaded
 
 
 from routers.auth import router as auth_router
 from routers.upload import router as upload_router
-from routers.evaluate import router as eval_router
 from routers.results import router as results_router
 from routers.model_answers import router as model_answers_router
+from routers.health import router as health_router
+from routers.jobs import router as jobs_router
 # (upload router already imported above)
 
 # Create DB tables
@@ -29,8 +33,31 @@ app.add_middleware(
 app.include_router(auth_router)
 app.include_router(upload_router)
 app.include_router(model_answers_router)
-app.include_router(eval_router)
+if APP_MODE == "full":
+    # evaluation pulls in OCR + embeddings; API-only workers never import it
+    from routers.evaluate import router as eval_router
+    app.include_router(eval_router)
+app.include_router(jobs_router)
 app.include_router(results_router)
+app.include_router(health_router)
+
+
+@app.exception_handler(Overloaded)
+def overloaded(request: Request, exc: Overloaded):
+    # shed load fast instead of letting every request slow down together
+    return JSONResponse(
+        {"detail": exc.detail},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.on_event("startup")
+def warm_up_models():
+    # load in the background: the port opens at once, /health/ready flips when done
+    if APP_MODE == "full" and MODEL_WARMUP:
+        from services.model_registry import start_warm_up
+        start_warm_up()
 
 
 @app.get("/")
@@ -0,0 +1,103 @@
+"""
+OCR throughput benchmark.
+
+Compares per-crop TrOCR decoding (batch size 1) against batched decoding
+on the same line crops. Run from the `backend` folder:
+
+    python bench_ocr.py uploads/sample.jpg --batch-sizes 4 8 16 --repeat 3
+"""
+import argparse
+import time
+
+from config import OCR_DETECTOR
+from services.hybrid_ocr import (
+    detect_boxes,
+    extract_line_crops,
+    merge_boxes_into_lines,
+    ocr_lines,
+    recognise_crops,
+    sort_boxes_reading_order,
+)
+from services.image_io import load_image
+
+
+def load_crops(paths, detector, merge_lines):
+    crops = []
+    for path in paths:
+        img = load_image(path)
+        if img is None:
+            print(f"⚠️ Skipping unreadable image: {path}")
+            continue
+        boxes = sort_boxes_reading_order(detect_boxes(img, detector))
+        if merge_lines:
+            boxes = merge_boxes_into_lines(boxes)
+        crops.extend(extract_line_crops(img, boxes))
+    return crops
+
+
+def time_decode(crops, batch_size, repeat):
+    best = None
+    texts = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texts = recognise_crops(crops, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, texts
+
+
+def print_stage_timings(paths):
+    """
+    Full ocr_lines per image with per-stage wall time; preprocessing should
+    stay flat as the box count grows.
+    """
+    for path in paths:
+        img = load_image(path)
+        if img is None:
+            continue
+        timings = {}
+        lines = ocr_lines(img, timings=timings)
+        stages = "  ".join(f"{name}={secs:.2f}s" for name, secs in timings.items())
+        print(f"{path}: {len(lines)} lines  {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-crop vs batched TrOCR throughput")
+    parser.add_argument("images", nargs="+", help="answer sheet images")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[4, 8, 16])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--detector", default=OCR_DETECTOR,
+                        choices=["easyocr", "easyocr-readtext", "projection"])
+    parser.add_argument("--no-merge", action="store_true",
+                        help="decode raw detector boxes instead of assembled lines")
+    parser.add_argument("--stages", action="store_true",
+                        help="also print per-stage timings of the full OCR pipeline")
+    args = parser.parse_args()
+
+    if args.stages:
+        print_stage_timings(args.images)
+
+    crops = load_crops(args.images, args.detector, not args.no_merge)
+    if not crops:
+        print("No line crops found.")
+        return
+
+    print(f"{len(crops)} line crops from {len(args.images)} image(s)")
+
+    # warm-up so the first timed run does not pay for lazy init
+    recognise_crops(crops[:1], batch_size=1)
+
+    base_time, base_texts = time_decode(crops, 1, args.repeat)
+    print(f"batch=1   {base_time:8.2f}s  {len(crops) / base_time:6.2f} crops/s")
+
+    for bs in args.batch_sizes:
+        t, texts = time_decode(crops, bs, args.repeat)
+        same = sum(a == b for a, b in zip(base_texts, texts))
+        print(
+            f"batch={bs:<3} {t:8.2f}s  {len(crops) / t:6.2f} crops/s  "
+            f"speedup x{base_time / t:4.2f}  identical lines {same}/{len(crops)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
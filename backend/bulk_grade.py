@@ -0,0 +1,207 @@
+"""
+Offline bulk grader: OCR, score and store a directory (or manifest) of
+answer sheets against one model answer, without going through HTTP.
+
+Sheets are fanned out over a process pool; each worker loads the models
+once. The model-answer vectors are loaded (or refreshed) once in the
+parent and handed to the workers. Results are inserted in bulk, and every
+committed file is appended to a checkpoint, so an interrupted run picks up
+where it stopped. The scans are never deleted. Run from `backend`:
+
+    python bulk_grade.py 12 --dir /data/term2/q3 --workers 4
+    python bulk_grade.py 12 --manifest files.txt --checkpoint q3.ckpt
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from config import ALLOWED_EXTENSIONS
+from serve import set_thread_env
+
+# per-worker state, set by _init_worker
+_worker = {}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Grade many answer sheets against one model answer")
+    parser.add_argument("model_answer_id", type=int)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="grade every image / PDF in this folder (recursive)")
+    source.add_argument("--manifest", help="text file with one sheet path per line")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=0,
+                        help="torch / ONNX threads per worker (default: cores // workers)")
+    parser.add_argument("--tier", default=None, help="force an OCR model tier")
+    parser.add_argument("--checkpoint", default=None,
+                        help="progress file (default: bulk_grade_<model_answer_id>.ckpt)")
+    parser.add_argument("--commit-every", type=int, default=50, help="results per bulk insert")
+    return parser.parse_args()
+
+
+def list_files(args):
+    if args.manifest:
+        with open(args.manifest) as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    paths = []
+    for root, _, names in os.walk(args.dir):
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in ALLOWED_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def load_checkpoint(path: str) -> set:
+    done = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["file_path"])
+                except (ValueError, KeyError):
+                    continue  # torn last line after a crash
+    return done
+
+
+def _init_worker(model_text: str, model_side: dict, tier: str, threads: int):
+    # under spawn / forkserver nothing set in main() is inherited
+    set_thread_env(threads)
+
+    import config
+    config.PDF_WORKERS = 0  # sheets are already spread over the pool
+
+    from services.model_registry import warm_up
+    warm_up()
+
+    _worker["model_text"] = model_text
+    _worker["model_side"] = model_side
+    _worker["tier"] = tier
+
+
+def grade_file(file_path: str) -> dict:
+    """
+    Runs in a worker: OCR + grading of one sheet, no DB writes.
+    """
+    from services.evaluation import grade_answer, ocr_file
+    from services.pdf_handler import page_count
+
+    pages = 1
+    try:
+        if file_path.lower().endswith(".pdf"):
+            pages = page_count(file_path)
+        text, engine, lang = ocr_file(file_path, _worker["tier"])
+        response = grade_answer(text, engine, lang, _worker["model_text"], _worker["model_side"])
+    except Exception as e:
+        return {"file_path": file_path, "pages": pages, "error": getattr(e, "detail", str(e))}
+
+    return {"file_path": file_path, "pages": pages, "response": response}
+
+
+def main():
+    args = parse_args()
+    threads = args.threads or max(1, (os.cpu_count() or 1) // max(args.workers, 1))
+    set_thread_env(threads)
+
+    from database import SessionLocal, engine
+    from models import Base, ModelAnswer
+    from services.embeddings import get_model_answer_embeddings
+    from services.evaluation import result_row
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    answer = db.query(ModelAnswer).filter(ModelAnswer.id == args.model_answer_id).first()
+    if not answer:
+        print(f"Model answer {args.model_answer_id} not found")
+        return 1
+
+    checkpoint = args.checkpoint or f"bulk_grade_{args.model_answer_id}.ckpt"
+    done = load_checkpoint(checkpoint)
+    files = [p for p in list_files(args) if p not in done]
+    print(f"{len(files)} sheets to grade ({len(done)} already done per {checkpoint})")
+    if not files:
+        return 0
+
+    # once here rather than in every worker: a stale stored vector is
+    # recomputed and committed by one process only
+    model_side = get_model_answer_embeddings(answer, db)
+
+    start = time.perf_counter()
+    broken = False
+    pending = []  # (file_path, row)
+    n_done = n_failed = n_pages = 0
+
+    def flush():
+        # bulk insert, then checkpoint only what is committed
+        if not pending:
+            return
+        db.add_all([row for _, row in pending])
+        db.commit()
+        with open(checkpoint, "a") as f:
+            for path, row in pending:
+                f.write(json.dumps({"file_path": path, "result_id": row.id}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        pending.clear()
+
+    # never fork: get_model_answer_embeddings may already have run torch
+    # (OpenMP pools) and started the embed-batcher thread in this process
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(answer.model_text, model_side, args.tier, threads),
+    ) as pool:
+        futures = [pool.submit(grade_file, p) for p in files]
+        try:
+            for future in as_completed(futures):
+                item = future.result()
+                n_pages += item["pages"]
+
+                if "error" in item:
+                    n_failed += 1
+                    print(f"⚠️ {item['file_path']}: {item['error']}")
+                else:
+                    n_done += 1
+                    pending.append((item["file_path"],
+                                    result_row(item["file_path"], item["response"], args.model_answer_id)))
+                    if len(pending) >= args.commit_every:
+                        flush()
+
+                finished = n_done + n_failed
+                if finished % 10 == 0 or finished == len(files):
+                    minutes = (time.perf_counter() - start) / 60
+                    rate = n_pages / minutes if minutes else 0.0
+                    print(f"{finished}/{len(files)} sheets  {n_failed} failed  "
+                          f"{rate:.1f} pages/min")
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            print("Interrupted, saving progress")
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for memory); the sheets it and the
+            # others still had are not checkpointed and run again next time
+            broken = True
+            print(f"⚠️ A worker process died, saving progress; "
+                  f"{len(files) - n_done - n_failed} sheets left for the next run")
+        finally:
+            flush()
+            db.close()
+
+    minutes = (time.perf_counter() - start) / 60
+    print(f"Graded {n_done}, failed {n_failed}, {n_pages} pages in {minutes:.1f} min "
+          f"({n_pages / minutes if minutes else 0.0:.1f} pages/min)")
+    if broken:
+        return 3
+    return 0 if not n_failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
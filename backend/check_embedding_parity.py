@@ -0,0 +1,82 @@
+"""
+Parity check: ONNX Runtime sentence embedder vs sentence-transformers.
+
+Re-scores stored results (student text vs model answer) with both backends
+and compares cosine similarities and final semantic scores. Exits with
+status 1 if any difference exceeds the allowed delta. Run from `backend`:
+
+    python check_embedding_parity.py --quantize --max-sim-delta 0.02 --max-score-delta 2.0
+"""
+import argparse
+import sys
+import time
+
+from sentence_transformers import util
+
+from database import SessionLocal
+from models import ModelAnswer, Result
+from services.embeddings import load_embedder
+from services.scoring import score_from_similarity
+
+
+def load_pairs(limit: int):
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Result.extracted_text, ModelAnswer.model_text)
+            .join(ModelAnswer, Result.model_answer_id == ModelAnswer.id)
+            .order_by(Result.id.desc())
+            .limit(limit)
+            .all()
+        )
+    finally:
+        db.close()
+
+    return [((s or "").strip(), (m or "").strip()) for s, m in rows if s and m]
+
+
+def similarities(embedder, pairs):
+    start = time.perf_counter()
+    stu = embedder.encode([s for s, _ in pairs], convert_to_tensor=True)
+    mod = embedder.encode([m for _, m in pairs], convert_to_tensor=True)
+    sims = util.pairwise_cos_sim(stu, mod).tolist()
+    return sims, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX vs PyTorch embedding parity")
+    parser.add_argument("--limit", type=int, default=500, help="most recent results to use")
+    parser.add_argument("--quantize", action="store_true", help="compare the int8 graphs")
+    parser.add_argument("--max-sim-delta", type=float, default=0.02)
+    parser.add_argument("--max-score-delta", type=float, default=2.0)
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.limit)
+    if not pairs:
+        print("No stored results to compare.")
+        return 1
+
+    reference = load_embedder("torch")
+    candidate = load_embedder("onnx", quantize=args.quantize)
+
+    ref_sims, ref_time = similarities(reference, pairs)
+    cand_sims, cand_time = similarities(candidate, pairs)
+
+    sim_deltas = [abs(a - b) for a, b in zip(ref_sims, cand_sims)]
+    score_deltas = [
+        abs(score_from_similarity(a, s, m) - score_from_similarity(b, s, m))
+        for a, b, (s, m) in zip(ref_sims, cand_sims, pairs)
+    ]
+
+    print(f"{len(pairs)} pairs  ({candidate.name})")
+    print(f"cosine delta  max {max(sim_deltas):.4f}  mean {sum(sim_deltas) / len(pairs):.4f}")
+    print(f"score delta   max {max(score_deltas):.2f}  mean {sum(score_deltas) / len(pairs):.2f}")
+    print(f"torch {ref_time:.2f}s  {candidate.name} {cand_time:.2f}s  "
+          f"speedup x{ref_time / max(cand_time, 1e-9):.2f}")
+
+    ok = max(sim_deltas) <= args.max_sim_delta and max(score_deltas) <= args.max_score_delta
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
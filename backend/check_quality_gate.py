@@ -0,0 +1,79 @@
+"""
+Sanity check for the pre-flight quality gate on synthetic sheets: a white
+page and a near-blank page must come back as "blank", a short sparse
+answer must pass, a washed-out photo must be "low_contrast". Exits with
+status 1 on any mismatch. Run from `backend`:
+
+    python check_quality_gate.py
+"""
+import sys
+
+import cv2
+import numpy as np
+
+from services.quality import assess_quality
+
+H, W = 1200, 1600
+
+
+def page(level: int = 255):
+    return np.full((H, W, 3), level, dtype=np.uint8)
+
+
+def white_page():
+    return page()
+
+
+def near_blank_page():
+    # a few specks of dust / scanner noise, well under QUALITY_MIN_INK
+    img = page()
+    rng = np.random.default_rng(0)
+    for x, y in zip(rng.integers(0, W, 40), rng.integers(0, H, 40)):
+        cv2.circle(img, (int(x), int(y)), 3, (30, 30, 30), -1)
+    return img
+
+
+def sparse_answer():
+    # one short line, ~0.3 % ink: global std-dev alone would call this low contrast
+    img = page(235)
+    cv2.putText(img, "x = 42", (200, 600), cv2.FONT_HERSHEY_SIMPLEX, 3, (25, 25, 25), 6)
+    return img
+
+
+def washed_out():
+    # lines of writing only ~20 gray levels darker than the paper
+    img = page(200)
+    for y in range(150, H - 100, 110):
+        cv2.putText(img, "the answer is written here", (80, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 2, (180, 180, 180), 5)
+    return img
+
+
+def dark_photo():
+    return page(20)
+
+
+CASES = [
+    ("white page", white_page, "blank"),
+    ("near-blank page", near_blank_page, "blank"),
+    ("sparse answer", sparse_answer, None),
+    ("washed-out photo", washed_out, "low_contrast"),
+    ("dark photo", dark_photo, "too_dark"),
+]
+
+
+def main():
+    failed = 0
+    for name, make, expected in CASES:
+        report = assess_quality(make())
+        ok = report["reason"] == expected
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: reason={report['reason']} "
+              f"(expected {expected}) {report['metrics']}")
+
+    print(f"{len(CASES) - failed}/{len(CASES)} cases as expected")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Parity check: ONNX Runtime TrOCR backend vs the PyTorch reference.
+
+Decodes the same line crops with both backends and compares the texts by
+character similarity. Exits with status 1 if the mean similarity drops
+below --min-similarity. Run from the `backend` folder:
+
+    python check_trocr_parity.py uploads/sample.jpg --quantize --min-similarity 0.97
+"""
+import argparse
+import difflib
+import sys
+import time
+
+from config import OCR_DEFAULT_TIER, OCR_ONNX_DIR, OCR_TIERS
+from services.hybrid_ocr import (
+    detect_boxes,
+    extract_line_crops,
+    merge_boxes_into_lines,
+    recognise_crops,
+    sort_boxes_reading_order,
+)
+from services.image_io import load_image
+from services.trocr_backend import OnnxTrOCRBackend, TorchTrOCRBackend
+
+
+def similarity(a: str, b: str) -> float:
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def timed(backend, crops, batch_size):
+    start = time.perf_counter()
+    texts = recognise_crops(crops, batch_size=batch_size, backend=backend)
+    return texts, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX vs PyTorch TrOCR parity")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--model", default=OCR_TIERS[OCR_DEFAULT_TIER])
+    parser.add_argument("--onnx-dir", default=OCR_ONNX_DIR)
+    parser.add_argument("--quantize", action="store_true", help="compare the int8 graphs")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--min-similarity", type=float, default=0.97)
+    args = parser.parse_args()
+
+    crops = []
+    for path in args.images:
+        img = load_image(path)
+        if img is None:
+            print(f"⚠️ Skipping unreadable image: {path}")
+            continue
+        boxes = merge_boxes_into_lines(sort_boxes_reading_order(detect_boxes(img)))
+        crops.extend(extract_line_crops(img, boxes))
+
+    if not crops:
+        print("No line crops found.")
+        return 1
+
+    reference = TorchTrOCRBackend(args.model)
+    candidate = OnnxTrOCRBackend(args.model, args.onnx_dir, quantize=args.quantize)
+
+    ref_texts, ref_time = timed(reference, crops, args.batch_size)
+    cand_texts, cand_time = timed(candidate, crops, args.batch_size)
+
+    scores = [similarity(a, b) for a, b in zip(ref_texts, cand_texts)]
+    for a, b, s in zip(ref_texts, cand_texts, scores):
+        if s < 1.0:
+            print(f"{s:5.3f}  torch: {a!r}\n       {candidate.name}: {b!r}")
+
+    mean = sum(scores) / len(scores)
+    exact = sum(s == 1.0 for s in scores)
+    print(f"{len(crops)} lines  exact {exact}/{len(crops)}  mean similarity {mean:.4f}  "
+          f"min {min(scores):.4f}")
+    print(f"torch {ref_time:.2f}s  {candidate.name} {cand_time:.2f}s  "
+          f"speedup x{ref_time / max(cand_time, 1e-9):.2f}")
+
+    return 0 if mean >= args.min_similarity else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
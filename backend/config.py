@@ -1,3 +1,5 @@
+import os
+
 SECRET_KEY = "EDUEVALVE_SUPER_SECRET"
 ALGORITHM = "HS256"
 
@@ -7,3 +9,129 @@ DB_PATH = "database/eduevalve.db"
 
 MAX_FILE_MB = 10
 ALLOWED_EXTENSIONS = [".jpg", ".jpeg", ".png", ".pdf"]
+
+# OCR
+OCR_BATCH_SIZE = 8          # line crops per TrOCR generate() call
+OCR_MAX_NEW_TOKENS = 128
+# "easyocr": CRAFT detection only, "easyocr-readtext": detection + recognition
+# (legacy, slower), "projection": horizontal projection profile, no model
+OCR_DETECTOR = "easyocr"
+# Cascade: keep EasyOCR's own reading for boxes it is confident about and
+# only send the rest to TrOCR (forces the readtext detector)
+OCR_CASCADE = False
+OCR_CASCADE_MIN_CONF = 0.85
+# whether the EasyOCR model is needed at all (the projection detector is model-free)
+OCR_USES_EASYOCR = OCR_CASCADE or OCR_DETECTOR.startswith("easyocr")
+# Line assembly: merge word boxes on the same text line into one crop
+OCR_MERGE_LINES = True
+OCR_LINE_MIN_Y_OVERLAP = 0.5    # vertical overlap / smaller box height
+OCR_LINE_MAX_GAP = 1.5          # horizontal gap / line height
+OCR_LINE_MAX_ASPECT = 24.0      # stop growing a line past this width/height
+# Page preprocessing, run once per page before cropping:
+# "nlm" (denoise + Otsu), "otsu", "adaptive" or "none" (grayscale only)
+OCR_PAGE_PREPROCESS = "nlm"
+# Resolution limits. Peak image memory per evaluation is bounded by the
+# decoded page (OCR_MAX_DECODE_PIXELS * 3 bytes, 48 MB at 16 MP) plus a
+# grayscale working copy and a detection copy of at most OCR_DETECT_MAX_DIM^2.
+# The decode bound holds for JPEG only (scaled while decoding); PNG and other
+# formats are decoded at full size first and downscaled afterwards, and are
+# refused above 4 x OCR_MAX_DECODE_PIXELS (image_io.NON_JPEG_MAX_PIXELS).
+OCR_MAX_DECODE_PIXELS = 16_000_000
+OCR_DETECT_MAX_DIM = 2048       # longest side fed to the text detector
+OCR_TARGET_TEXT_HEIGHT = 64     # recognition source is downscaled to ~this line height
+
+# Intermediate images (preprocessed pages, line crops, rendered PDF pages) are
+# only written to disk when this is set, e.g. EDUEVALVE_DEBUG_DUMP_DIR=uploads/debug
+DEBUG_DUMP_DIR = os.getenv("EDUEVALVE_DEBUG_DUMP_DIR")
+
+# Pre-flight quality gate (upload and before OCR), on a small copy of the page
+QUALITY_GATE = True
+QUALITY_MAX_DIM = 512
+QUALITY_MIN_BRIGHTNESS = 40.0   # mean gray level; below = black/underexposed
+QUALITY_MIN_CONTRAST = 12.0     # faint marks = this much darker than the paper level
+QUALITY_INK_DELTA = 40          # ink = this much darker than the paper level
+QUALITY_MIN_INK = 0.002         # fraction of ink pixels; below = blank sheet
+QUALITY_MIN_SHARPNESS = 0.08    # stroke-edge Laplacian / dynamic range
+
+# PDF answer sheets: pages are rendered in memory and OCR'd on a process pool.
+# At most PDF_WORKERS pages are decoded at once; 0 = render/OCR in-process.
+# Workers are started with forkserver / spawn and hold their own copy of the
+# OCR models; their threads are the cores left after the parent's torch threads.
+PDF_DPI = 200
+PDF_WORKERS = 2
+PDF_MAX_PAGES = 40
+
+# Recognition backend: "torch" (fp32 PyTorch) or "onnx" (ONNX Runtime with
+# KV cache; needs optimum[onnxruntime])
+OCR_BACKEND = "torch"
+OCR_ONNX_DIR = "models/onnx"    # exported / quantised graphs are cached here
+OCR_ONNX_QUANTIZE = True        # dynamic int8 weights
+OCR_ONNX_THREADS = 0            # ORT intra-op threads, 0 = ORT default
+
+# Sentence embeddings (scoring + explainability): "torch" (sentence-transformers)
+# or "onnx" (ONNX Runtime, same mean pooling; needs optimum[onnxruntime])
+EMBED_MODEL_ID = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBED_BACKEND = "torch"
+EMBED_ONNX_DIR = "models/onnx"
+EMBED_ONNX_QUANTIZE = True
+EMBED_ONNX_THREADS = 0
+EMBED_MAX_SEQ_LENGTH = 128
+
+# TrOCR model tiers, best first. Values may be hub ids or local folders.
+# Tiers load on first use. With a latency budget, each request gets the best
+# tier whose estimated time (per-line cost x expected lines x queue depth)
+# fits the budget; None always uses OCR_DEFAULT_TIER.
+OCR_TIERS = {
+    "large": "microsoft/trocr-large-handwritten",
+    "base": "microsoft/trocr-base-handwritten",
+    "small": "microsoft/trocr-small-handwritten",
+}
+OCR_DEFAULT_TIER = "large"
+OCR_LATENCY_BUDGET_S = None
+OCR_TIER_LINE_SECONDS = {"large": 1.2, "base": 0.5, "small": 0.25}  # CPU priors, refined online
+OCR_EXPECTED_LINES = 25
+EMBED_CACHE_SIZE = 256          # model answers kept in the embedding LRU
+
+# Sentence alignment in explanations: "best" (each student sentence -> its
+# best model sentence), "topk" (up to EXPLAIN_TOP_K per student sentence) or
+# "one_to_one" (greedy, each model sentence matched at most once)
+EXPLAIN_MATCH_MODE = "best"
+EXPLAIN_TOP_K = 2
+
+# Cross-request embedding micro-batching: texts submitted by concurrent
+# evaluations within the window are encoded together, EMBED_MAX_BATCH texts
+# per forward pass
+EMBED_MICROBATCH = True
+EMBED_BATCH_WINDOW_MS = 5
+EMBED_MAX_BATCH = 64            # texts per forward pass
+
+# Process role: "full" serves evaluation and loads the models in a
+# background thread at startup (EDUEVALVE_WARMUP=0 defers them to first
+# use); "api" skips the evaluation routes and never imports the inference
+# stacks (front-door workers)
+APP_MODE = os.getenv("EDUEVALVE_MODE", "full")
+MODEL_WARMUP = os.getenv("EDUEVALVE_WARMUP", "1") == "1"
+
+# Evaluation job queue (POST /eval/jobs, drained by job_worker.py)
+JOB_WORKERS = 2
+JOB_POLL_S = 0.5                # idle worker poll interval
+JOB_HEARTBEAT_S = 10            # running jobs refresh their heartbeat this often
+JOB_STALE_S = 60                # no heartbeat for this long: the worker died, requeue
+JOB_MAX_ATTEMPTS = 3
+
+# Admission control per process: at most *_MAX_INFLIGHT concurrent runs of
+# a stage, *_MAX_QUEUE more waiting up to *_QUEUE_TIMEOUT_S; beyond that
+# requests get 429 (queue full) or 503 (waited too long) with Retry-After
+OCR_MAX_INFLIGHT = 2
+OCR_MAX_QUEUE = 16
+OCR_QUEUE_TIMEOUT_S = 30
+EMBED_MAX_INFLIGHT = 4
+EMBED_MAX_QUEUE = 64
+EMBED_QUEUE_TIMEOUT_S = 10
+# with EMBED_MICROBATCH the batcher replaces the embedding governor: at most
+# this many texts wait for a forward pass, beyond that requests get 429
+EMBED_MAX_QUEUED_TEXTS = 1024
+
+# POST /eval/batch
+BATCH_MAX_FILES = 200
+BATCH_PREFETCH = 2              # sheets decoded + quality-checked ahead of OCR
@@ -0,0 +1,25 @@
+import sqlite3
+
+DB_PATH = "eduevalve.db"
+
+COLUMNS = [
+    ("sentences_json", "TEXT"),
+    ("text_embedding", "BLOB"),
+    ("sentence_embeddings", "BLOB"),
+    ("embedding_key", "VARCHAR(300)"),
+]
+
+conn = sqlite3.connect(DB_PATH)
+cur = conn.cursor()
+
+for name, col_type in COLUMNS:
+    try:
+        cur.execute(f"ALTER TABLE model_answers ADD COLUMN {name} {col_type}")
+        print(f"✅ Column {name} added successfully!")
+    except Exception as e:
+        print(f"⚠️ Column {name} already exists OR error:", e)
+
+conn.commit()
+conn.close()
+
+# Embeddings are filled in lazily on the next evaluation of each model answer.
@@ -0,0 +1,110 @@
+"""
+Evaluation job workers: drain the queue filled by POST /eval/jobs.
+
+Like serve.py, the models are loaded once in the parent and the workers
+are forked from it. Workers that die are restarted; the job they were
+running is requeued by the heartbeat sweep. Run from the `backend` folder:
+
+    python job_worker.py --workers 2 --threads 4
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+from serve import respawn_delay, set_thread_env
+
+
+def parse_args():
+    import config
+
+    parser = argparse.ArgumentParser(description="Run evaluation job workers")
+    parser.add_argument("--workers", type=int, default=config.JOB_WORKERS)
+    parser.add_argument("--threads", type=int, default=0,
+                        help="torch / ONNX threads per worker (default: cores // workers)")
+    return parser.parse_args()
+
+
+def run_worker(threads: int):
+    # the pool was created by the parent (create_all); open fresh connections
+    from database import engine
+    engine.dispose(close=False)
+
+    import torch
+    torch.set_num_threads(threads)
+
+    from services.jobs import work_loop
+    work_loop(f"{socket.gethostname()}:{os.getpid()}")
+
+
+def main():
+    args = parse_args()
+    threads = args.threads or max(1, (os.cpu_count() or 1) // max(args.workers, 1))
+    set_thread_env(threads)
+
+    import config
+    config.PDF_WORKERS = 0  # PDF pages run in the worker, as in serve.py
+
+    from database import engine
+    from models import Base
+    from services.model_registry import warm_up
+
+    Base.metadata.create_all(bind=engine)
+    warm_up()
+    gc.collect()
+    gc.freeze()
+
+    children = {}  # pid -> start time
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                run_worker(threads)
+            finally:
+                os._exit(0)
+        children[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"{args.workers} job workers x {threads} threads")
+
+    delay = 0.0
+    while children:
+        try:
+            pid, status = os.wait()
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if not stopping:
+            # same crash-loop backoff as serve.py
+            uptime = time.time() - started if started is not None else 0.0
+            delay = respawn_delay(uptime, delay)
+            print(f"⚠️ Job worker {pid} exited ({status}), restarting in {delay:.0f}s")
+            time.sleep(delay)
+            if not stopping:
+                spawn()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
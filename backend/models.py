@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, LargeBinary
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
@@ -21,6 +21,13 @@ class ModelAnswer(Base):
     model_text = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # precomputed embeddings (float16 blobs), see services/embeddings.py
+    sentences_json = Column(Text, nullable=True)
+    text_embedding = Column(LargeBinary, nullable=True)
+    sentence_embeddings = Column(LargeBinary, nullable=True)
+    # embedder version + text hash the stored vectors belong to
+    embedding_key = Column(String(300), nullable=True)
+
     results = relationship("Result", back_populates="model_answer")
 
 
@@ -47,3 +54,27 @@ class Result(Base):
     model_answer = relationship("ModelAnswer", back_populates="results")
 
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class EvalJob(Base):
+    __tablename__ = "eval_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    file_path = Column(String(500), nullable=False)
+    model_answer_id = Column(Integer, ForeignKey("model_answers.id"), nullable=False)
+    ocr_tier = Column(String(20), nullable=True)
+
+    # queued -> running -> done | failed; see services/jobs.py
+    state = Column(String(20), nullable=False, default="queued", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    result_id = Column(Integer, ForeignKey("results.id"), nullable=True)
+    response_json = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,81 +1,281 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+from database import SessionLocal
 from utils import get_db
-from schema import EvaluateRequest, EvaluateResponse
-from models import ModelAnswer, Result
+from schema import EvaluateRequest, EvaluateResponse, EvaluateMultiRequest, EvaluateMultiResponse
+from schema import EvaluateBatchRequest, EvaluateBatchResponse
+from config import BATCH_MAX_FILES, OCR_MAX_INFLIGHT, OCR_MAX_QUEUE
+from models import ModelAnswer
 
-from services.hybrid_ocr import hybrid_ocr
-from services.scoring import semantic_score
-from services.feedback import gen_feedback, missing_keywords
+from services.admission import Overloaded, ocr_governor
+from services.embeddings import get_model_answer_embeddings
+from services.evaluation import (
+    EvaluationError,
+    check_tier,
+    evaluate_batch,
+    evaluate_file,
+    load_page,
+    ocr_pdf,
+    remove_upload,
+    score_answer,
+    stream_evaluation,
+)
+from services.hybrid_ocr import hybrid_ocr_lines
+from services.segmenter import segment_answers, split_lines_by_regions
 from services.text_cleaner import clean_text
-import json
-
-# ✅ ADD THIS
-from services.explainability import explain_answer
 
 router = APIRouter(prefix="/eval", tags=["Evaluation"])
 
+# /stream work runs here, one thread per stream from OCR to the DB write.
+# A stream only gets submitted with one of the _stream_slots, so it never
+# waits in the executor's (unbounded) queue: a full pool is answered 429.
+_STREAM_WORKERS = OCR_MAX_INFLIGHT + OCR_MAX_QUEUE
+_stream_pool = ThreadPoolExecutor(max_workers=_STREAM_WORKERS, thread_name_prefix="eval-stream")
+_stream_slots = threading.BoundedSemaphore(_STREAM_WORKERS)
+
 
 @router.post("/", response_model=EvaluateResponse)
 def evaluate(req: EvaluateRequest, db: Session = Depends(get_db)):
-    # 1) load model answer
-    model_ans = db.query(ModelAnswer).filter(ModelAnswer.id == req.model_answer_id).first()
-    if not model_ans:
-        raise HTTPException(status_code=404, detail="Model answer not found")
+    try:
+        row, response = evaluate_file(db, req.file_path, req.model_answer_id, req.ocr_tier)
+    except EvaluationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-    # 2) OCR
-    extracted_text, engine, lang = hybrid_ocr(req.file_path)
-    extracted_text = clean_text(extracted_text)
+    return response
 
-    if not extracted_text or len(extracted_text.strip()) < 3:
-        raise HTTPException(status_code=400, detail="OCR failed: no readable text found")
 
-    # 3) semantic score (UNCHANGED)
-    score = semantic_score(extracted_text, model_ans.model_text)
-
-    # 4) feedback + missing keywords
-    fb = gen_feedback(score)
-    missing = missing_keywords(extracted_text, model_ans.model_text)
-
-    # ✅ 5) Explainable AI output
-    explainable_ai = explain_answer(extracted_text, model_ans.model_text)
-
-    # 6) store in DB (OPTIONAL - you can skip DB save for explainable)
-    row = Result(
-        file_path=req.file_path,
-        extracted_text=extracted_text,
-        ocr_engine=engine,
-        language=lang,
-        score=score,
-        feedback=fb,
-        missing_keywords=",".join(missing) if missing else None,
-        explainable_output=json.dumps(explainable_ai),
-
-        model_answer_id=model_ans.id,
-        
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def evaluate_stream(req: EvaluateRequest):
+    """
+    /eval/ as Server-Sent Events: "detected", one "line" per recognised
+    line, "score", "explanation", then "result" with the stored result id.
+    The response starts only once the OCR admission slot is granted, so a
+    bad request or overload still gets its 4xx / 429 / 503 status; later
+    failures arrive as an "error" event. The work runs on a bounded thread
+    pool; when the client disconnects it stops at the next OCR batch / page.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancel = threading.Event()
+    admitted = threading.Event()
+    started = loop.create_future()
+
+    def settle(error=None):
+        # resolve `started` from the worker thread, first call wins
+        def resolve():
+            if started.done():
+                return
+            if error is None:
+                started.set_result(None)
+            else:
+                started.set_exception(error)
+        loop.call_soon_threadsafe(resolve)
+
+    def on_admit():
+        admitted.set()
+        settle()
+
+    def emit(event, data):
+        if not cancel.is_set():
+            loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    def work():
+        try:
+            run()
+        finally:
+            _stream_slots.release()
+
+    def run():
+        if cancel.is_set():
+            settle()
+            emit(None, None)
+            return
+
+        db = SessionLocal()
+        try:
+            stream_evaluation(db, req.file_path, req.model_answer_id, req.ocr_tier,
+                              emit, cancel, on_admit)
+        except Exception as e:
+            if not admitted.is_set():
+                # nothing sent yet: the handler turns this into the HTTP response
+                settle(e)
+            elif isinstance(e, EvaluationError):
+                emit("error", {"status_code": e.status_code, "detail": e.detail})
+            elif isinstance(e, Overloaded):
+                emit("error", {"status_code": e.status_code, "detail": e.detail,
+                               "retry_after": e.retry_after})
+            else:
+                emit("error", {"status_code": 500, "detail": str(e)})
+        finally:
+            db.close()
+            settle()
+            emit(None, None)
+
+    if not _stream_slots.acquire(blocking=False):
+        hold = ocr_governor.stats()["avg_hold_seconds"]
+        raise Overloaded("Server busy (stream pool full), retry later", 429, max(1, math.ceil(hold)))
+    try:
+        _stream_pool.submit(work)
+    except Exception:
+        _stream_slots.release()
+        raise
+
+    try:
+        # Overloaded propagates to the app's 429 / 503 handler
+        await started
+    except EvaluationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+
+    async def events():
+        try:
+            while True:
+                event, data = await queue.get()
+                if event is None:
+                    break
+                yield _sse(event, data)
+        finally:
+            # normal end, or the client went away and the response was cancelled
+            cancel.set()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    db.add(row)
-    db.commit()
-    db.refresh(row)
 
-    # ✅ delete uploaded file after evaluation
-    import os
-    if os.path.exists(req.file_path):
-        os.remove(req.file_path)
+@router.post("/batch", response_model=EvaluateBatchResponse)
+def evaluate_batch_route(req: EvaluateBatchRequest, response: Response,
+                         db: Session = Depends(get_db)):
+    """
+    A stack of answer sheets for one question. Sheets that fail (unreadable,
+    no text) are reported per file; the rest are scored and stored. Sheets
+    turned away by OCR admission are listed in `not_processed` and the
+    response carries Retry-After: resubmit only those.
+    """
+    if len(req.file_paths) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_FILES} files per batch")
 
-    clean_path = req.file_path.replace(".", "_clean.")
-    if os.path.exists(clean_path):
-        os.remove(clean_path)
+    try:
+        items = evaluate_batch(db, req.file_paths, req.model_answer_id, req.ocr_tier)
+    except EvaluationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    results = [
+        {
+            "file_path": item["file_path"],
+            "ok": item["ok"],
+            "processed": item["processed"],
+            "result_id": item["row"].id if item["ok"] else None,
+            "error": item["error"],
+            "result": item["response"],
+        }
+        for item in items
+    ]
+    succeeded = sum(1 for r in results if r["ok"])
+    not_processed = [item["file_path"] for item in items if not item["processed"]]
+    if not_processed:
+        retry_after = max(item["retry_after"] for item in items if not item["processed"])
+        response.headers["Retry-After"] = str(retry_after)
 
-    # ✅ RETURN explainable_ai also
     return {
-        "text": extracted_text,
-        "score": score,
-        "feedback": fb,
-        "language": lang,
-        "ocr_engine": engine,
-        "missing_keywords": missing,
-        "explainable_ai": explainable_ai,  # ✅ THIS IS THE MAIN FIX
+        "model_answer_id": req.model_answer_id,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded - len(not_processed),
+        "not_processed": not_processed,
+        "results": results,
     }
+
+
+@router.post("/multi", response_model=EvaluateMultiResponse)
+def evaluate_multi(req: EvaluateMultiRequest, db: Session = Depends(get_db)):
+    """
+    Several questions on one answer sheet: OCR once, split the text per
+    question by marker or region hint, and store one Result per question.
+    """
+    try:
+        return _evaluate_multi(req, db)
+    except EvaluationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+def _evaluate_multi(req: EvaluateMultiRequest, db: Session):
+    questions = req.questions
+    is_pdf = req.file_path.lower().endswith(".pdf")
+    use_regions = any(q.region for q in questions)
+
+    if use_regions and not all(q.region for q in questions):
+        raise HTTPException(status_code=400, detail="Give a region for every question or for none")
+    if use_regions and is_pdf:
+        raise HTTPException(status_code=400, detail="Region hints are only supported for images")
+    if not use_regions and len(questions) > 1 and not all(q.marker for q in questions):
+        raise HTTPException(status_code=400, detail="Each question needs a marker or a region")
+    check_tier(req.ocr_tier)
+
+    # 1) load all model answers up front
+    ids = {q.model_answer_id for q in questions}
+    answers = {a.id: a for a in db.query(ModelAnswer).filter(ModelAnswer.id.in_(ids)).all()}
+    missing_ids = sorted(ids - answers.keys())
+    if missing_ids:
+        raise HTTPException(status_code=404, detail=f"Model answer(s) not found: {missing_ids}")
+
+    # 2) OCR once, then segment
+    if is_pdf:
+        text, engine, lang = ocr_pdf(req.file_path, req.ocr_tier)
+        segments = segment_answers(text, [q.marker for q in questions])
+    else:
+        img = load_page(req.file_path)
+        lines, engine, lang = hybrid_ocr_lines(img, tier=req.ocr_tier)
+
+        if use_regions:
+            h, w = img.shape[:2]
+            segments = split_lines_by_regions(lines, [q.region for q in questions], w, h)
+        else:
+            text = "\n".join(line["text"] for line in lines)
+            segments = segment_answers(text, [q.marker for q in questions])
+
+    if not any(clean_text(s) for s in segments):
+        raise HTTPException(status_code=400, detail="OCR failed: no readable text found")
+
+    # model-answer vectors first: a lazy refresh commits, rows must not be pending yet
+    sides = {a_id: get_model_answer_embeddings(a, db) for a_id, a in answers.items()}
+
+    # 3) score each answered question, 4) store all rows in one commit;
+    # a question whose marker / region yielded no text gets no Result
+    scored = []
+    unanswered = []
+    for i, (q, segment) in enumerate(zip(questions, segments)):
+        segment = clean_text(segment)
+        if not segment:
+            unanswered.append(i)
+            continue
+        row, response = score_answer(
+            db, req.file_path, segment, engine, lang,
+            answers[q.model_answer_id], sides[q.model_answer_id],
+        )
+        scored.append((q, row, response))
+
+    db.commit()
+
+    remove_upload(req.file_path)
+
+    results = []
+    for q, row, response in scored:
+        results.append({**response, "model_answer_id": q.model_answer_id, "result_id": row.id})
+
+    return {"ocr_engine": engine, "language": lang, "results": results, "unanswered": unanswered}
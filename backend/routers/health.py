@@ -1,4 +1,10 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from config import APP_MODE
+from services.admission import get_admission_stats
+from services.memory import process_memory
+from services.model_registry import get_model_states
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
@@ -6,3 +12,39 @@ router = APIRouter(prefix="/health", tags=["Health"])
 @router.get("/")
 def health():
     return {"status": "ok"}
+
+
+@router.get("/ready")
+def ready():
+    # 503 until the models this worker serves with are loaded
+    states = get_model_states()
+    return JSONResponse(states, status_code=200 if states["ready"] else 503)
+
+
+@router.get("/admission")
+def admission():
+    return get_admission_stats()
+
+
+@router.get("/memory")
+def memory():
+    # RSS / PSS of the worker that answers; see serve.py for the fork layout
+    return process_memory()
+
+
+# inference stats: imported on call, so API-only workers never load them
+
+@router.get("/ocr")
+def ocr_stats():
+    if APP_MODE != "full":
+        return {"mode": APP_MODE}
+    from services.hybrid_ocr import get_ocr_stats
+    return get_ocr_stats()
+
+
+@router.get("/embeddings")
+def embedding_stats():
+    if APP_MODE != "full":
+        return {"mode": APP_MODE}
+    from services.embeddings import get_batcher_stats, get_cache_stats
+    return {"model_answer_cache": get_cache_stats(), "micro_batching": get_batcher_stats()}
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from config import OCR_TIERS
+from models import EvalJob, ModelAnswer
+from schema import EvalJobCreated, EvalJobStatus, EvaluateRequest
+from services.jobs import enqueue_job, get_job_metrics, job_status
+from utils import get_db
+
+# Enqueue / poll only: the jobs run in job_worker.py, so this router is
+# mounted in API-only mode too.
+router = APIRouter(prefix="/eval/jobs", tags=["Evaluation jobs"])
+
+
+@router.post("/", response_model=EvalJobCreated, status_code=202)
+def create_job(req: EvaluateRequest, db: Session = Depends(get_db)):
+    if not db.query(ModelAnswer.id).filter(ModelAnswer.id == req.model_answer_id).first():
+        raise HTTPException(status_code=404, detail="Model answer not found")
+    if req.ocr_tier and req.ocr_tier not in OCR_TIERS:
+        raise HTTPException(status_code=400, detail=f"Unknown OCR tier. Allowed: {list(OCR_TIERS)}")
+
+    job = enqueue_job(db, req.file_path, req.model_answer_id, req.ocr_tier)
+    return {"job_id": job.id, "state": job.state}
+
+
+@router.get("/metrics")
+def job_metrics(db: Session = Depends(get_db)):
+    return get_job_metrics(db)
+
+
+@router.get("/{job_id}", response_model=EvalJobStatus)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(EvalJob).filter(EvalJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
+from config import APP_MODE
 from database import get_db
 from models import ModelAnswer
 from schema import ModelAnswerCreate, ModelAnswerOut, ModelAnswerUpdate
+from services.embeddings import invalidate_model_answer, store_model_answer_embeddings
 
 router = APIRouter(prefix="/model-answers", tags=["Model Answers"])
 
@@ -22,6 +24,10 @@ def create_model_answer(data: ModelAnswerCreate, db: Session = Depends(get_db)):
         question_title=data.question_title,
         model_text=data.model_text
     )
+    # sentences + embeddings are computed once here, not on every /eval
+    # (API-only workers leave it to the first evaluation, which stores them)
+    if APP_MODE == "full":
+        store_model_answer_embeddings(new_answer)
     db.add(new_answer)
     db.commit()
     db.refresh(new_answer)
@@ -38,6 +44,7 @@ def delete_model_answer(answer_id: int, db: Session = Depends(get_db)):
 
     db.delete(answer)
     db.commit()
+    invalidate_model_answer(answer_id)
     return {"message": "Model answer deleted successfully"}
 
 
@@ -51,8 +58,11 @@ def update_model_answer(answer_id: int, data: ModelAnswerUpdate, db: Session = D
 
     answer.question_title = data.question_title
     answer.model_text = data.model_text
+    if APP_MODE == "full":
+        store_model_answer_embeddings(answer)
 
     db.commit()
     db.refresh(answer)
+    invalidate_model_answer(answer_id)
 
     return answer
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 import uuid
 from PIL import Image
 import io
 
+from config import QUALITY_GATE, QUALITY_MAX_DIM
+from services.image_io import decode_image
+from services.quality import assess_quality
+
 router = APIRouter(prefix="/files", tags=["Files"])
 
 UPLOAD_DIR = Path("uploads")
@@ -35,6 +40,11 @@ def validate_file(file: UploadFile):
     return ext
 
 
+def _preview_quality(data: bytes) -> dict:
+    preview = decode_image(data, max_pixels=4 * QUALITY_MAX_DIM * QUALITY_MAX_DIM)
+    return assess_quality(preview)
+
+
 @router.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     ext = validate_file(file)
@@ -60,6 +70,13 @@ async def upload_file(file: UploadFile = File(...)):
         except:
             raise HTTPException(status_code=400, detail="Not a valid image file.")
 
+        # 5b) quality gate: reject blank / black / blurry sheets before any OCR
+        if QUALITY_GATE:
+            # decoding a full-size PNG takes long: keep it off the event loop
+            report = await run_in_threadpool(_preview_quality, data)
+            if not report["ok"]:
+                raise HTTPException(status_code=400, detail=report)
+
     # 6) safe unique filename
     safe_name = f"{uuid.uuid4().hex}{ext}"
     save_path = UPLOAD_DIR / safe_name
@@ -38,6 +38,8 @@ class ModelAnswerOut(BaseModel):
 class EvaluateRequest(BaseModel):
     file_path: str
     model_answer_id: int
+    # force an OCR model tier ("large", "base", "small"); default: chosen by load
+    ocr_tier: Optional[str] = None
 
 
 class EvaluateResponse(BaseModel):
@@ -51,6 +53,72 @@ class EvaluateResponse(BaseModel):
     # ✅ ADD THIS
     explainable_ai: Optional[Dict[str, Any]] = None
 
+class QuestionSpec(BaseModel):
+    model_answer_id: int
+    # text that starts this question's answer on the sheet, e.g. "Q2"
+    marker: Optional[str] = None
+    # [x1, y1, x2, y2] as fractions (0-1) of the page size; images only
+    region: Optional[List[float]] = Field(None, min_length=4, max_length=4)
+
+
+class EvaluateMultiRequest(BaseModel):
+    file_path: str
+    questions: List[QuestionSpec] = Field(..., min_length=1)
+    ocr_tier: Optional[str] = None
+
+
+class QuestionResult(EvaluateResponse):
+    model_answer_id: int
+    result_id: int
+
+
+class EvaluateMultiResponse(BaseModel):
+    ocr_engine: str
+    language: str
+    results: List[QuestionResult]
+    # positions in `questions` with no text on the sheet (no Result stored)
+    unanswered: List[int] = []
+
+class EvaluateBatchRequest(BaseModel):
+    model_answer_id: int
+    file_paths: List[str] = Field(..., min_length=1)
+    ocr_tier: Optional[str] = None
+
+
+class BatchItemResult(BaseModel):
+    file_path: str
+    ok: bool
+    processed: bool = True
+    result_id: Optional[int] = None
+    error: Optional[Any] = None
+    result: Optional[EvaluateResponse] = None
+
+
+class EvaluateBatchResponse(BaseModel):
+    model_answer_id: int
+    succeeded: int
+    failed: int
+    not_processed: List[str] = []
+    results: List[BatchItemResult]
+
+
+class EvalJobCreated(BaseModel):
+    job_id: int
+    state: str
+
+
+class EvalJobStatus(BaseModel):
+    job_id: int
+    state: str
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[Any] = None
+    result_id: Optional[int] = None
+    # set once the job is done
+    result: Optional[EvaluateResponse] = None
+
 # ---------- RESULTS ----------
 class ResultOut(BaseModel):
     id: int
@@ -0,0 +1,177 @@
+"""
+Load-once, fork-many server.
+
+The parent process loads EasyOCR, the default TrOCR tier and the embedder
+once, freezes the garbage collector and then forks N uvicorn workers that
+accept on one shared socket. The weights are inherited copy-on-write, so
+they are in memory once instead of once per worker; each worker gets its
+own slice of the cores for torch / ONNX Runtime threads. Linux only (fork).
+Run from the `backend` folder:
+
+    python serve.py --workers 4 --threads 2 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+# a worker that dies sooner than this after its start counts as a crash loop
+MIN_WORKER_UPTIME = 30.0
+MAX_RESPAWN_DELAY = 60.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preload models, then fork uvicorn workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=0,
+                        help="torch / ONNX threads per worker (default: cores // workers)")
+    parser.add_argument("--memory-report", type=float, default=60.0,
+                        help="seconds between per-worker RSS/PSS lines (0 = off)")
+    return parser.parse_args()
+
+
+def respawn_delay(uptime: float, delay: float) -> float:
+    """
+    Seconds to wait before restarting a worker that ran for `uptime` seconds,
+    given the previous delay: doubling up to MAX_RESPAWN_DELAY while workers
+    keep dying right after their start, none otherwise.
+    """
+    if uptime < MIN_WORKER_UPTIME:
+        return min(max(delay * 2, 1.0), MAX_RESPAWN_DELAY)
+    return 0.0
+
+
+def set_thread_env(threads: int):
+    # must happen before torch / onnxruntime are imported
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    import config
+    config.OCR_ONNX_THREADS = threads
+    config.EMBED_ONNX_THREADS = threads
+
+
+def preload():
+    """
+    Load the default models in the parent. No inference runs here: the
+    OpenMP pools must be created after fork, inside each worker.
+    """
+    import config
+    config.MODEL_WARMUP = False  # already loaded, workers skip the warm-up thread
+    # no PDF pool per worker: it would load its own model copies and use
+    # the cores the other workers were given (read at import, so set first)
+    config.PDF_WORKERS = 0
+
+    from services.model_registry import get_model_states, warm_up
+    if config.APP_MODE == "full":
+        warm_up()
+
+    from app import app
+
+    # keep the collector from writing to (and so copying) the shared objects
+    gc.collect()
+    gc.freeze()
+    return app, get_model_states()
+
+
+def run_worker(app, sock, host: str, port: int, threads: int):
+    # pooled SQLite connections opened by the parent must not be shared
+    from database import engine
+    engine.dispose(close=False)
+
+    import torch
+    torch.set_num_threads(threads)
+
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, workers=1))
+    server.run(sockets=[sock])
+
+
+def main():
+    args = parse_args()
+    threads = args.threads or max(1, (os.cpu_count() or 1) // max(args.workers, 1))
+    set_thread_env(threads)
+
+    start = time.perf_counter()
+    app, states = preload()
+    loaded = ", ".join(f"{name}={s['state']}" for name, s in states["models"].items())
+    print(f"Models loaded in {time.perf_counter() - start:.1f}s ({loaded})")
+
+    from services.memory import process_memory
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                run_worker(app, sock, args.host, args.port, threads)
+            finally:
+                os._exit(0)
+        children[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"{args.workers} workers x {threads} threads on {args.host}:{args.port}")
+
+    last_report = time.time()
+    respawn_at = []  # due times of workers waiting to be restarted
+    delay = 0.0
+    while children or (respawn_at and not stopping):
+        pid, status = os.waitpid(-1, os.WNOHANG) if children else (0, 0)
+        if pid:
+            started = children.pop(pid, None)
+            if not stopping:
+                # back off exponentially while workers keep dying right after start
+                uptime = time.time() - started if started is not None else MIN_WORKER_UPTIME
+                delay = respawn_delay(uptime, delay)
+                print(f"⚠️ Worker {pid} exited ({status}), restarting in {delay:.0f}s")
+                respawn_at.append(time.time() + delay)
+            continue
+
+        if not stopping:
+            due = [t for t in respawn_at if t <= time.time()]
+            respawn_at = [t for t in respawn_at if t > time.time()]
+            for _ in due:
+                spawn()
+
+        if args.memory_report and time.time() - last_report >= args.memory_report:
+            last_report = time.time()
+            for pid_, role in [("self", "parent")] + [(c, "worker") for c in children]:
+                mem = process_memory(pid_)
+                print(f"{role} {mem['pid']}: {mem['mb']}")
+
+        time.sleep(0.5)
+
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from config import (
+    EMBED_MAX_INFLIGHT,
+    EMBED_MAX_QUEUE,
+    EMBED_QUEUE_TIMEOUT_S,
+    OCR_MAX_INFLIGHT,
+    OCR_MAX_QUEUE,
+    OCR_QUEUE_TIMEOUT_S,
+)
+
+
+class Overloaded(Exception):
+    """
+    A request turned away by a Governor; app.py maps it to a 429 / 503
+    response with a Retry-After header.
+    """
+
+    def __init__(self, detail: str, status_code: int, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Governor:
+    """
+    Bounded concurrency for one inference stage.
+
+    At most `max_inflight` callers run the stage at once. Up to `max_queue`
+    more wait, each for at most `queue_timeout_s`. A caller that finds the
+    queue full is rejected at once (429); one whose wait runs out gets 503.
+    Retry-After comes from the observed hold time of a slot.
+    """
+
+    def __init__(self, name: str, max_inflight: int, max_queue: int, queue_timeout_s: float):
+        self.name = name
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._waiting = 0
+        self._hold_s = 1.0  # moving average of the time a slot is held
+        self._counts = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    def _retry_after(self) -> int:
+        backlog = (self._waiting + 1) / max(self.max_inflight, 1)
+        return max(1, math.ceil(self._hold_s * backlog))
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            if self._inflight >= self.max_inflight:
+                if self._waiting >= self.max_queue:
+                    self._counts["rejected"] += 1
+                    raise Overloaded(f"Server busy ({self.name} queue full), retry later",
+                                     429, self._retry_after())
+
+                self._waiting += 1
+                self._counts["queued"] += 1
+                deadline = time.monotonic() + self.queue_timeout_s
+                try:
+                    while self._inflight >= self.max_inflight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._counts["timed_out"] += 1
+                            raise Overloaded(f"Server busy ({self.name} wait timed out), retry later",
+                                             503, self._retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._inflight += 1
+            self._counts["admitted"] += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._inflight -= 1
+                self._hold_s = 0.8 * self._hold_s + 0.2 * (time.monotonic() - start)
+                self._cond.notify()
+
+    def waiting(self) -> int:
+        # callers queued for a slot right now
+        with self._cond:
+            return self._waiting
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "in_flight": self._inflight,
+                "queued": self._waiting,
+                "max_in_flight": self.max_inflight,
+                "max_queue": self.max_queue,
+                "avg_hold_seconds": round(self._hold_s, 2),
+                **self._counts,
+            }
+
+
+ocr_governor = Governor("ocr", OCR_MAX_INFLIGHT, OCR_MAX_QUEUE, OCR_QUEUE_TIMEOUT_S)
+embed_governor = Governor("embedding", EMBED_MAX_INFLIGHT, EMBED_MAX_QUEUE, EMBED_QUEUE_TIMEOUT_S)
+
+
+def get_admission_stats() -> dict:
+    return {"ocr": ocr_governor.stats(), "embedding": embed_governor.stats()}
@@ -0,0 +1,148 @@
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from services.admission import Overloaded
+
+# upper bounds of the batch-size histogram buckets
+_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces encode requests from concurrent evaluations.
+
+    Callers submit a list of texts and get a Future. A single scheduler
+    thread takes everything that arrives within `window_ms` of the first
+    pending request, up to `max_batch` texts, runs one `encode_fn` call and
+    hands each caller its slice. A request larger than `max_batch` runs on
+    its own (and `encode_fn` splits it into several forward passes). The scheduler is also the only thread touching the model, so
+    concurrent requests no longer fight over intra-op threads.
+
+    Admission is by queued texts rather than by callers: a submit that would
+    push more than `max_queued` texts into the queue raises Overloaded (429).
+    """
+
+    def __init__(self, encode_fn, window_ms: float = 5, max_batch: int = 64,
+                 max_queued: int = 1024):
+        self.encode_fn = encode_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_queued = max_queued
+
+        self._pending = deque()  # (texts, future, submitted_at)
+        self._queued = 0         # texts in _pending
+        self._batch_s = 0.05     # moving average of one encode_fn call
+        self._rejected = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+        self._batches = 0
+        self._texts = 0
+        self._histogram = {b: 0 for b in _BUCKETS}
+        self._histogram["more"] = 0
+        self._waits = deque(maxlen=1000)
+
+    def submit(self, texts) -> Future:
+        future = Future()
+        texts = list(texts)
+        if not texts:
+            future.set_result(None)
+            return future
+
+        with self._cond:
+            # an oversized request is still let into an empty queue
+            if self._pending and self._queued + len(texts) > self.max_queued:
+                self._rejected += 1
+                retry_after = max(1, math.ceil(self._batch_s * self._queued / self.max_batch))
+                raise Overloaded("Server busy (embedding queue full), retry later", 429, retry_after)
+
+            self._ensure_thread()
+            self._pending.append((texts, future, time.perf_counter()))
+            self._queued += len(texts)
+            self._cond.notify()
+        return future
+
+    def encode(self, texts):
+        return self.submit(texts).result()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            deadline = self._pending[0][2] + self.window
+            while True:
+                queued = sum(len(p[0]) for p in self._pending)
+                remaining = deadline - time.perf_counter()
+                if queued >= self.max_batch or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size = [], 0
+            while self._pending:
+                n = len(self._pending[0][0])
+                if batch and size + n > self.max_batch:
+                    break
+                batch.append(self._pending.popleft())
+                size += n
+            self._queued -= size
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            started = time.perf_counter()
+            texts = [t for (req_texts, _, _) in batch for t in req_texts]
+
+            try:
+                emb = self.encode_fn(texts)
+            except Exception as e:
+                for (_, future, _) in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for (req_texts, future, _) in batch:
+                future.set_result(emb[offset:offset + len(req_texts)])
+                offset += len(req_texts)
+
+            self._record(batch, len(texts), started)
+
+    def _record(self, batch, n_texts, started):
+        with self._cond:
+            self._batch_s = 0.8 * self._batch_s + 0.2 * (time.perf_counter() - started)
+            self._batches += 1
+            self._texts += n_texts
+            bucket = next((b for b in _BUCKETS if n_texts <= b), "more")
+            self._histogram[bucket] += 1
+            for (_, _, submitted_at) in batch:
+                self._waits.append(started - submitted_at)
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            pending = list(self._pending)
+            return {
+                "queue_depth": len(pending),
+                "queued_texts": self._queued,
+                "max_queued_texts": self.max_queued,
+                "rejected": self._rejected,
+                "batches": self._batches,
+                "texts": self._texts,
+                "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+                "batch_size_histogram": {f"<={b}" if b != "more" else f">{_BUCKETS[-1]}": n
+                                         for b, n in self._histogram.items()},
+                "wait_ms": {
+                    "avg": round(1000 * sum(waits) / len(waits), 2) if waits else 0.0,
+                    "p95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+                    "max": round(1000 * waits[-1], 2) if waits else 0.0,
+                },
+            }
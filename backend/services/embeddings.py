@@ -0,0 +1,346 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import (
+    EMBED_BACKEND,
+    EMBED_BATCH_WINDOW_MS,
+    EMBED_CACHE_SIZE,
+    EMBED_MAX_BATCH,
+    EMBED_MAX_QUEUED_TEXTS,
+    EMBED_MAX_SEQ_LENGTH,
+    EMBED_MODEL_ID,
+    EMBED_ONNX_DIR,
+    EMBED_ONNX_QUANTIZE,
+    EMBED_MICROBATCH,
+    EMBED_ONNX_THREADS,
+)
+from services.admission import embed_governor
+from services.embed_batcher import EmbeddingBatcher
+from services.model_registry import loading
+from services.onnx_export import prepare_onnx_model, session_options
+from services.text_cleaner import split_sentences
+
+
+class OnnxSentenceEmbedder:
+    """
+    Drop-in for SentenceTransformer.encode on ONNX Runtime, optionally with
+    int8 weights. Uses the same mean pooling as the sentence-transformers
+    model card, so vectors are comparable with the PyTorch backend.
+    """
+
+    def __init__(self, model_id: str, cache_dir: str, quantize: bool = True,
+                 threads: int = 0, max_seq_length: int = EMBED_MAX_SEQ_LENGTH):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.name = "onnx-int8" if quantize else "onnx"
+        self.max_seq_length = max_seq_length
+
+        model_dir = prepare_onnx_model(
+            model_id, cache_dir, quantize, ORTModelForFeatureExtraction, AutoTokenizer
+        )
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_dir, session_options=session_options(threads)
+        )
+
+    def _encode_batch(self, texts):
+        features = self.tokenizer(
+            texts, padding=True, truncation=True,
+            max_length=self.max_seq_length, return_tensors="pt",
+        )
+        token_embeddings = self.model(**features).last_hidden_state
+
+        mask = features["attention_mask"].unsqueeze(-1).to(token_embeddings.dtype)
+        summed = (token_embeddings * mask).sum(dim=1)
+        return summed / mask.sum(dim=1).clamp(min=1e-9)
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_tensor: bool = False,
+               normalize_embeddings: bool = False, **kwargs):
+        import torch
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if not texts:
+            empty = torch.empty(0)
+            return empty if convert_to_tensor else empty.numpy()
+
+        # longest first, like sentence-transformers, to keep padding small
+        order = np.argsort([-len(t) for t in texts])
+        chunks = []
+        with torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                idx = order[start:start + batch_size]
+                chunks.append(self._encode_batch([texts[i] for i in idx]))
+
+        sorted_emb = torch.cat(chunks)
+        emb = torch.empty_like(sorted_emb)
+        emb[torch.as_tensor(order)] = sorted_emb
+
+        if normalize_embeddings:
+            emb = torch.nn.functional.normalize(emb, p=2, dim=1)
+        if single:
+            emb = emb[0]
+
+        return emb if convert_to_tensor else emb.numpy()
+
+
+def load_embedder(kind: str = EMBED_BACKEND, model_id: str = EMBED_MODEL_ID,
+                  quantize: bool = EMBED_ONNX_QUANTIZE):
+    """
+    Sentence embedder with the SentenceTransformer.encode interface.
+    """
+    if kind == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_id)
+    if kind == "onnx":
+        return OnnxSentenceEmbedder(
+            model_id, EMBED_ONNX_DIR, quantize=quantize, threads=EMBED_ONNX_THREADS
+        )
+
+    raise ValueError(f"Unknown embedding backend: {kind}")
+
+
+# -----------------------------
+# Shared embedder
+# -----------------------------
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """
+    The one embedder instance per process, shared by scoring and
+    explainability.
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                with loading("embedder"):
+                    _embedder = load_embedder()
+    return _embedder
+
+
+_batcher = None
+
+
+def _get_batcher():
+    global _batcher
+    if _batcher is None:
+        with _embedder_lock:
+            if _batcher is None:
+                # batch_size = max_batch: a coalesced batch is one forward pass
+                _batcher = EmbeddingBatcher(
+                    lambda texts: get_embedder().encode(
+                        texts, batch_size=EMBED_MAX_BATCH, convert_to_tensor=True
+                    ),
+                    window_ms=EMBED_BATCH_WINDOW_MS, max_batch=EMBED_MAX_BATCH,
+                    max_queued=EMBED_MAX_QUEUED_TEXTS,
+                )
+    return _batcher
+
+
+def encode_texts(texts):
+    """
+    (N, dim) tensor for a list of texts, encoded EMBED_MAX_BATCH texts per
+    forward pass. With EMBED_MICROBATCH on, texts from concurrent requests
+    share those passes (see embed_batcher); the batcher bounds its queued
+    texts itself, so callers do not take an embed_governor slot, which
+    would cap how many of them can be coalesced.
+    """
+    if EMBED_MICROBATCH:
+        return _get_batcher().encode(texts)
+    with embed_governor.slot():
+        return get_embedder().encode(list(texts), batch_size=EMBED_MAX_BATCH, convert_to_tensor=True)
+
+
+def get_batcher_stats() -> dict:
+    if _batcher is None:
+        return {"enabled": EMBED_MICROBATCH, "batches": 0}
+    return {"enabled": EMBED_MICROBATCH, **_batcher.stats()}
+
+
+# -----------------------------
+# Model-answer embeddings (persisted + LRU)
+# -----------------------------
+
+_answer_cache = OrderedDict()   # (answer_id, embedding key) -> embeddings dict
+_answer_cache_lock = threading.Lock()
+_answer_cache_stats = {
+    "hits": 0, "misses": 0, "evictions": 0, "invalidations": 0,
+    "loaded_from_db": 0, "computed": 0,
+}
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embedder_version() -> str:
+    """
+    Identifies the vectors an embedder produces; stored vectors from any
+    other version are recomputed on first use.
+    """
+    if EMBED_BACKEND == "onnx":
+        return f"onnx{'-int8' if EMBED_ONNX_QUANTIZE else ''}:{EMBED_MODEL_ID}"
+    return f"{EMBED_BACKEND}:{EMBED_MODEL_ID}"
+
+
+def embedding_key(model_text: str) -> str:
+    return f"{embedder_version()}|{text_hash((model_text or '').strip())}"
+
+
+def encode_model_answer(model_text: str) -> dict:
+    """
+    Everything scoring and explainability need from a model answer:
+    the full-text embedding, its sentences and their embeddings.
+    """
+    model_text = (model_text or "").strip()
+
+    sentences = split_sentences(model_text)
+    emb = encode_texts([model_text] + sentences)
+    return {
+        "text_emb": emb[0],
+        "sentences": sentences,
+        "sentence_emb": emb[1:] if sentences else None,
+    }
+
+
+def encode_sides(texts) -> list:
+    """
+    Full-text and sentence vectors for many texts from a single encode()
+    call; one dict per text, shaped like encode_model_answer's result.
+    """
+    batch = []
+    spans = []
+    for text in texts:
+        text = (text or "").strip()
+        sentences = split_sentences(text)
+        spans.append((len(batch), sentences))
+        batch.extend([text] + sentences)
+
+    emb = encode_texts(batch)
+
+    return [
+        {
+            "text_emb": emb[start],
+            "sentences": sentences,
+            "sentence_emb": emb[start + 1:start + 1 + len(sentences)] if sentences else None,
+        }
+        for start, sentences in spans
+    ]
+
+
+def encode_evaluation(student_text: str, model_text: str, model_side: dict = None) -> dict:
+    """
+    All vectors one evaluation needs, from a single encode() call: the
+    student's full text and sentences, plus the model answer's when no
+    precomputed `model_side` is given. Returns {"student": ..., "model": ...},
+    each shaped like encode_model_answer's result.
+    """
+    if model_side is not None:
+        return {"student": encode_sides([student_text])[0], "model": model_side}
+
+    student_side, model_side = encode_sides([student_text, model_text])
+    return {"student": student_side, "model": model_side}
+
+
+def _pack(emb) -> bytes:
+    return emb.detach().cpu().numpy().astype(np.float16).tobytes()
+
+
+def _unpack(blob: bytes, dim: int):
+    import torch
+
+    arr = np.frombuffer(blob, dtype=np.float16).astype(np.float32).reshape(-1, dim)
+    return torch.from_numpy(arr)
+
+
+def store_model_answer_embeddings(answer) -> dict:
+    """
+    Compute the model-answer vectors and put them on the ORM row as float16
+    blobs (the caller commits). Used on create / update and for lazy refresh.
+    """
+    entry = encode_model_answer(answer.model_text)
+
+    answer.sentences_json = json.dumps(entry["sentences"])
+    answer.text_embedding = _pack(entry["text_emb"])
+    answer.sentence_embeddings = _pack(entry["sentence_emb"]) if entry["sentences"] else None
+    answer.embedding_key = embedding_key(answer.model_text)
+
+    return entry
+
+
+def _load_stored(answer):
+    if answer.embedding_key != embedding_key(answer.model_text) or not answer.text_embedding:
+        return None
+
+    text_emb = _unpack(answer.text_embedding, len(answer.text_embedding) // 2)[0]
+    sentences = json.loads(answer.sentences_json or "[]")
+    sentence_emb = None
+    if sentences and answer.sentence_embeddings:
+        sentence_emb = _unpack(answer.sentence_embeddings, text_emb.shape[0])
+
+    return {"text_emb": text_emb, "sentences": sentences, "sentence_emb": sentence_emb}
+
+
+def get_model_answer_embeddings(answer, db=None) -> dict:
+    """
+    Model-answer vectors for a ModelAnswer row: LRU first, then the float16
+    blobs stored on the row, else computed once. Freshly computed vectors
+    are written back to the row (committed if `db` is given), so a changed
+    embedder version is repaired lazily on first use.
+    """
+    key = (answer.id, embedding_key(answer.model_text))
+
+    with _answer_cache_lock:
+        entry = _answer_cache.get(key)
+        if entry is not None:
+            _answer_cache.move_to_end(key)
+            _answer_cache_stats["hits"] += 1
+            return entry
+        _answer_cache_stats["misses"] += 1
+
+    entry = _load_stored(answer)
+    if entry is not None:
+        stat = "loaded_from_db"
+    else:
+        entry = store_model_answer_embeddings(answer)
+        stat = "computed"
+        if db is not None:
+            db.commit()
+
+    with _answer_cache_lock:
+        _answer_cache_stats[stat] += 1
+        _answer_cache[key] = entry
+        _answer_cache.move_to_end(key)
+        while len(_answer_cache) > EMBED_CACHE_SIZE:
+            _answer_cache.popitem(last=False)
+            _answer_cache_stats["evictions"] += 1
+
+    return entry
+
+
+def invalidate_model_answer(answer_id: int):
+    with _answer_cache_lock:
+        for key in [k for k in _answer_cache if k[0] == answer_id]:
+            del _answer_cache[key]
+            _answer_cache_stats["invalidations"] += 1
+
+
+def get_cache_stats() -> dict:
+    with _answer_cache_lock:
+        stats = dict(_answer_cache_stats)
+        stats["size"] = len(_answer_cache)
+
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
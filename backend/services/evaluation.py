@@ -0,0 +1,404 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import Session
+
+from config import BATCH_PREFETCH, OCR_MAX_INFLIGHT, OCR_TIERS, QUALITY_GATE
+from models import ModelAnswer, Result
+from services.admission import Overloaded
+from services.embeddings import encode_evaluation, encode_sides, get_model_answer_embeddings
+from services.explainability import batch_similarity_matrices, explain_answer
+from services.feedback import gen_feedback, missing_keywords
+from services.hybrid_ocr import hybrid_ocr, hybrid_ocr_pdf, hybrid_ocr_stream
+from services.image_io import load_image
+from services.quality import assess_quality
+from services.scoring import semantic_score
+from services.text_cleaner import clean_text
+
+
+class EvaluationError(Exception):
+    """
+    An evaluation that cannot succeed for this input (bad file, unknown
+    model answer, no text). Routers turn it into an HTTP error; the job
+    worker marks the job failed without retrying.
+    """
+
+    def __init__(self, detail, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def load_page(file_path: str):
+    """
+    Decode an uploaded image once and run the quality gate on it.
+    """
+    img = load_image(file_path)
+    if img is None:
+        raise EvaluationError("Could not read the uploaded image")
+
+    if QUALITY_GATE:
+        report = assess_quality(img)
+        if not report["ok"]:
+            raise EvaluationError(report)
+
+    return img
+
+
+def check_tier(tier):
+    if tier and tier not in OCR_TIERS:
+        raise EvaluationError(f"Unknown OCR tier. Allowed: {list(OCR_TIERS)}")
+
+
+def ocr_pdf(file_path: str, tier: str = None, cancel=None, on_admit=None):
+    try:
+        return hybrid_ocr_pdf(file_path, tier=tier, cancel=cancel, on_admit=on_admit)
+    except ValueError as e:
+        raise EvaluationError(str(e))
+
+
+def ocr_file(file_path: str, tier: str = None, page=None):
+    """
+    (cleaned text, engine, language) for an uploaded image or PDF.
+    `page` is the image already decoded by load_page, if the caller has it.
+    """
+    if file_path.lower().endswith(".pdf"):
+        text, engine, lang = ocr_pdf(file_path, tier)
+    else:
+        # decode once, the array goes through every OCR stage
+        page = page if page is not None else load_page(file_path)
+        text, engine, lang = hybrid_ocr(page, tier=tier)
+
+    text = clean_text(text)
+    if not text or len(text.strip()) < 3:
+        raise EvaluationError("OCR failed: no readable text found")
+
+    return text, engine, lang
+
+
+def get_model_answer(db: Session, model_answer_id: int) -> ModelAnswer:
+    model_ans = db.query(ModelAnswer).filter(ModelAnswer.id == model_answer_id).first()
+    if not model_ans:
+        raise EvaluationError("Model answer not found", status_code=404)
+    return model_ans
+
+
+def grade_score(extracted_text: str, model_text: str, model_side: dict,
+                student_side: dict) -> dict:
+    """
+    The scoring step: score, feedback and missing keywords.
+    """
+    # semantic score (UNCHANGED)
+    score = semantic_score(extracted_text, model_text, model_side, student_side)
+
+    # feedback + missing keywords
+    return {
+        "score": score,
+        "feedback": gen_feedback(score),
+        "missing_keywords": missing_keywords(extracted_text, model_text),
+    }
+
+
+def grade_explanation(extracted_text: str, model_text: str, model_side: dict,
+                      student_side: dict, sim_matrix=None) -> dict:
+    """
+    The explanation step (Explainable AI output).
+    """
+    return explain_answer(extracted_text, model_text, model_side, student_side, sim_matrix)
+
+
+def build_response(extracted_text: str, engine: str, lang: str, graded: dict,
+                   explainable_ai: dict) -> dict:
+    # the EvaluateResponse dict, from grade_score's and grade_explanation's output
+    return {
+        "text": extracted_text,
+        "score": graded["score"],
+        "feedback": graded["feedback"],
+        "language": lang,
+        "ocr_engine": engine,
+        "missing_keywords": graded["missing_keywords"],
+        "explainable_ai": explainable_ai,
+    }
+
+
+def grade_answer(extracted_text: str, engine: str, lang: str, model_text: str,
+                 model_side: dict, student_side: dict = None, sim_matrix=None) -> dict:
+    """
+    Score, feedback, missing keywords and explanation for one answer, as the
+    EvaluateResponse dict. `model_side` comes from get_model_answer_embeddings;
+    `student_side` and `sim_matrix` are passed in by batch callers that
+    computed them together.
+    """
+    # one encode pass for the student side, shared by scoring and explanation
+    if student_side is None:
+        student_side = encode_evaluation(extracted_text, model_text, model_side)["student"]
+
+    graded = grade_score(extracted_text, model_text, model_side, student_side)
+    explainable_ai = grade_explanation(
+        extracted_text, model_text, model_side, student_side, sim_matrix
+    )
+
+    return build_response(extracted_text, engine, lang, graded, explainable_ai)
+
+
+def result_row(file_path: str, response: dict, model_answer_id: int) -> Result:
+    missing = response["missing_keywords"]
+    return Result(
+        file_path=file_path,
+        extracted_text=response["text"],
+        ocr_engine=response["ocr_engine"],
+        language=response["language"],
+        score=response["score"],
+        feedback=response["feedback"],
+        missing_keywords=",".join(missing) if missing else None,
+        explainable_output=json.dumps(response["explainable_ai"]),
+
+        model_answer_id=model_answer_id,
+    )
+
+
+def stage_result(db: Session, file_path: str, response: dict, model_answer_id: int) -> Result:
+    # add the Result row for `response` to the session (caller commits)
+    row = result_row(file_path, response, model_answer_id)
+    db.add(row)
+    return row
+
+
+def score_answer(db: Session, file_path: str, extracted_text: str, engine: str,
+                 lang: str, model_ans: ModelAnswer, model_side: dict,
+                 student_side: dict = None, sim_matrix=None):
+    """
+    grade_answer, then stage its Result row (caller commits).
+    Returns (row, response dict).
+    """
+    response = grade_answer(
+        extracted_text, engine, lang, model_ans.model_text, model_side, student_side, sim_matrix
+    )
+    return stage_result(db, file_path, response, model_ans.id), response
+
+
+def remove_upload(file_path: str):
+    # ✅ delete uploaded file after evaluation
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def stage_evaluation(db: Session, file_path: str, model_answer_id: int, tier: str = None):
+    """
+    OCR, score and explain one uploaded answer and stage its Result row;
+    the caller commits (the job worker adds its own bookkeeping to the
+    same transaction). Returns (row, response dict).
+    """
+    # 1) load model answer
+    model_ans = get_model_answer(db, model_answer_id)
+    check_tier(tier)
+
+    # 2) OCR
+    extracted_text, engine, lang = ocr_file(file_path, tier)
+
+    # 3) score + explanation, 4) store in DB
+    # model-answer vectors: cache / stored blobs, computed at most once
+    model_side = get_model_answer_embeddings(model_ans, db)
+    return score_answer(db, file_path, extracted_text, engine, lang, model_ans, model_side)
+
+
+def evaluate_file(db: Session, file_path: str, model_answer_id: int, tier: str = None):
+    """
+    The whole single-answer evaluation: stage_evaluation, commit, delete
+    the upload. Returns (row, response dict).
+    """
+    row, response = stage_evaluation(db, file_path, model_answer_id, tier)
+    db.commit()
+
+    remove_upload(file_path)
+
+    return row, response
+
+
+def _error_detail(e: Exception):
+    return e.detail if isinstance(e, EvaluationError) else str(e)
+
+
+def _prefetch_page(file_path: str):
+    # images only; PDFs are rendered page by page inside ocr_pdf
+    return None if file_path.lower().endswith(".pdf") else load_page(file_path)
+
+
+def _ocr_prefetched(file_path: str, tier: str, page):
+    # runs on the batch's OCR pool; `page` is the decode future for the sheet
+    return ocr_file(file_path, tier, page.result())
+
+
+def evaluate_batch(db: Session, file_paths, model_answer_id: int, tier: str = None):
+    """
+    Many answer sheets against one model answer.
+
+    The model answer and its vectors are loaded once. Up to OCR_MAX_INFLIGHT
+    sheets are OCR'd at once, and sheets are decoded and quality-checked
+    BATCH_PREFETCH ahead of them. All student texts are embedded in one
+    encode pass and compared with one similarity matmul. The Result rows
+    are stored in one commit. A sheet that fails is reported in its item
+    and does not fail the batch. When OCR admission is refused (Overloaded)
+    part way, the sheets done so far are still scored and stored and the
+    rest come back with processed=False and the Retry-After; if no sheet
+    got through at all, Overloaded is raised.
+    Returns a list of {"file_path", "ok", "processed", "error", "retry_after",
+    "row", "response"}.
+    """
+    model_ans = get_model_answer(db, model_answer_id)
+    check_tier(tier)
+    # before staging rows: a lazy refresh commits
+    model_side = get_model_answer_embeddings(model_ans, db)
+
+    items = [{"file_path": p, "ok": False, "processed": True, "error": None, "retry_after": None,
+              "row": None, "response": None}
+             for p in file_paths]
+
+    # 1) decode ahead, OCR OCR_MAX_INFLIGHT sheets at a time, collect in order
+    ocr = []  # (item, text, engine, lang)
+    overloaded = None
+    ahead = max(1, BATCH_PREFETCH)
+    workers = max(1, OCR_MAX_INFLIGHT)
+    window = workers + ahead
+    with ThreadPoolExecutor(max_workers=ahead) as decode_pool, \
+            ThreadPoolExecutor(max_workers=workers) as ocr_pool:
+        futures = {}
+
+        def submit(i):
+            path = items[i]["file_path"]
+            page = decode_pool.submit(_prefetch_page, path)
+            futures[i] = ocr_pool.submit(_ocr_prefetched, path, tier, page)
+
+        # sliding window: at most `window` sheets are decoded or in OCR
+        for i in range(min(window, len(items))):
+            submit(i)
+
+        for i, item in enumerate(items):
+            future = futures.pop(i, None)
+            if overloaded is None and i + window < len(items):
+                submit(i + window)
+
+            try:
+                if future is None or future.cancelled():
+                    raise overloaded
+                text, engine, lang = future.result()
+            except Overloaded as e:
+                # load shedding, not a bad sheet: stop feeding OCR, keep
+                # what already runs, report the rest as not processed
+                if overloaded is None:
+                    overloaded = e
+                    for f in futures.values():
+                        f.cancel()
+                item["processed"] = False
+                item["error"] = e.detail
+                item["retry_after"] = e.retry_after
+                continue
+            except Exception as e:
+                item["error"] = _error_detail(e)
+                continue
+            ocr.append((item, text, engine, lang))
+
+    if not ocr:
+        if overloaded is not None:
+            raise overloaded
+        return items
+
+    # 2) one encode pass + one similarity matmul for all students
+    student_sides = encode_sides([text for (_, text, _, _) in ocr])
+    if model_side["sentences"]:
+        matrices = batch_similarity_matrices(
+            [side["sentence_emb"] if side["sentences"] else [] for side in student_sides],
+            model_side["sentence_emb"],
+        )
+    else:
+        matrices = [None] * len(ocr)
+
+    # 3) score + explain, 4) one transaction
+    for (item, text, engine, lang), side, matrix in zip(ocr, student_sides, matrices):
+        try:
+            item["row"], item["response"] = score_answer(
+                db, item["file_path"], text, engine, lang, model_ans, model_side, side, matrix
+            )
+        except Overloaded:
+            db.rollback()
+            raise
+        except Exception as e:
+            item["error"] = _error_detail(e)
+
+    db.commit()
+
+    for item in items:
+        if item["row"] is not None:
+            item["ok"] = True
+            remove_upload(item["file_path"])
+
+    return items
+
+
+def stream_evaluation(db: Session, file_path: str, model_answer_id: int, tier: str,
+                      emit, cancel, on_admit=None):
+    """
+    evaluate_file with progress: calls emit(event, data) with "detected"
+    (line count), "line" (per recognised line), "score", "explanation" and
+    finally "result" (the stored result id). on_admit() is called once the
+    OCR admission slot is granted; errors raised before that mean nothing
+    was emitted. Once the threading.Event `cancel` is set (client gone) it
+    stops between OCR batches / PDF pages / stages and stores nothing.
+    """
+    model_ans = get_model_answer(db, model_answer_id)
+    check_tier(tier)
+
+    # 1) OCR, line by line
+    if file_path.lower().endswith(".pdf"):
+        # pages are decoded in the PDF workers; lines arrive all at once
+        text, engine, lang = ocr_pdf(file_path, tier, cancel=cancel, on_admit=on_admit)
+        if cancel.is_set():
+            return None
+        for i, line in enumerate(t for t in text.split("\n") if t.strip()):
+            emit("line", {"index": i, "text": line})
+    else:
+        page = load_page(file_path)
+        events = hybrid_ocr_stream(page, tier=tier, cancel=cancel, on_admit=on_admit,
+                                   on_detect=lambda n: emit("detected", {"lines": n}))
+        index = 0
+        for event, data in events:
+            if event == "line":
+                emit("line", {"index": index, "text": data["text"], "box": list(data["box"])})
+                index += 1
+            else:
+                lines, engine, lang = data
+        text = "\n".join(line["text"] for line in lines)
+
+    if cancel.is_set():
+        return None
+
+    extracted_text = clean_text(text)
+    if not extracted_text or len(extracted_text.strip()) < 3:
+        raise EvaluationError("OCR failed: no readable text found")
+
+    # 2) score
+    model_side = get_model_answer_embeddings(model_ans, db)
+    student_side = encode_evaluation(extracted_text, model_ans.model_text, model_side)["student"]
+    graded = grade_score(extracted_text, model_ans.model_text, model_side, student_side)
+    emit("score", {**graded, "language": lang, "ocr_engine": engine})
+
+    if cancel.is_set():
+        return None
+
+    # 3) explanation
+    explainable_ai = grade_explanation(extracted_text, model_ans.model_text, model_side, student_side)
+    emit("explanation", explainable_ai)
+
+    if cancel.is_set():
+        return None
+
+    # 4) store
+    response = build_response(extracted_text, engine, lang, graded, explainable_ai)
+    row = stage_result(db, file_path, response, model_ans.id)
+    db.commit()
+
+    remove_upload(file_path)
+
+    emit("result", {"result_id": row.id})
+    return row
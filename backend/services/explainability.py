@@ -1,35 +1,90 @@
-import re
-from typing import Dict, List
-
-from sentence_transformers import SentenceTransformer, util
-
-# Use same SBERT model
-embedder = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
-
-
-def _clean_text(text: str) -> str:
-    text = (text or "").strip()
-    text = re.sub(r"\s+", " ", text)
-    return text
-
-
-def split_sentences(text: str) -> List[str]:
-    text = _clean_text(text)
-    if not text:
-        return []
-
-    parts = re.split(r"(?<=[.!?])\s+|\n+", text)
-
-    sentences = []
-    for s in parts:
-        s = s.strip()
-        if len(s) >= 12:
-            sentences.append(s)
-
-    return sentences
-
-
-def explain_answer(student_text: str, model_text: str) -> Dict:
+from typing import Dict, List, Tuple
+
+import torch
+
+from config import EXPLAIN_MATCH_MODE, EXPLAIN_TOP_K
+from services.embeddings import encode_evaluation
+
+SENT_MATCH_THRESHOLD = 0.35
+
+
+def similarity_matrix(stu_emb, mod_emb):
+    """
+    Full student x model cosine similarity matrix from one normalised matmul.
+    """
+    stu = torch.nn.functional.normalize(torch.as_tensor(stu_emb), p=2, dim=-1)
+    mod = torch.nn.functional.normalize(torch.as_tensor(mod_emb), p=2, dim=-1)
+    return stu @ mod.T
+
+
+def batch_similarity_matrices(student_embs: List, mod_emb) -> List:
+    """
+    Similarity matrices for many students against one model answer: one
+    matmul over all student sentences, split back per student.
+    """
+    sizes = [len(e) for e in student_embs]
+    if not sum(sizes):
+        return [None] * len(student_embs)
+
+    stacked = torch.cat([torch.as_tensor(e) for e in student_embs if len(e)])
+    blocks = iter(similarity_matrix(stacked, mod_emb).split([n for n in sizes if n]))
+    return [next(blocks) if n else None for n in sizes]
+
+
+def align_sentences(sim_matrix, threshold: float = SENT_MATCH_THRESHOLD,
+                    mode: str = EXPLAIN_MATCH_MODE, top_k: int = EXPLAIN_TOP_K
+                    ) -> List[Tuple[int, int, float]]:
+    """
+    (student index, model index, similarity) matches at or above `threshold`,
+    in student order.
+    """
+    if mode == "best":
+        best_sim, best_j = sim_matrix.max(dim=1)
+        keep = (best_sim >= threshold).nonzero().flatten().tolist()
+        best_sim, best_j = best_sim.tolist(), best_j.tolist()
+        return [(i, best_j[i], best_sim[i]) for i in keep]
+
+    if mode == "topk":
+        k = min(top_k, sim_matrix.shape[1])
+        top_sim, top_j = sim_matrix.topk(k, dim=1)
+        top_sim, top_j = top_sim.tolist(), top_j.tolist()
+        return [
+            (i, j, v)
+            for i in range(len(top_sim))
+            for v, j in zip(top_sim[i], top_j[i])
+            if v >= threshold
+        ]
+
+    if mode == "one_to_one":
+        # greedy assignment over the above-threshold pairs, highest first
+        rows, cols = (sim_matrix >= threshold).nonzero(as_tuple=True)
+        values = sim_matrix[rows, cols]
+        order = values.argsort(descending=True).tolist()
+        rows, cols, values = rows.tolist(), cols.tolist(), values.tolist()
+
+        used_i, used_j, pairs = set(), set(), []
+        for k in order:
+            i, j = rows[k], cols[k]
+            if i in used_i or j in used_j:
+                continue
+            used_i.add(i)
+            used_j.add(j)
+            pairs.append((i, j, values[k]))
+
+        return sorted(pairs)
+
+    raise ValueError(f"Unknown sentence match mode: {mode}")
+
+
+def explain_answer(student_text: str, model_text: str, model_side: dict = None,
+                   student_side: dict = None, sim_matrix=None) -> Dict:
+    """
+    Similarity, length ratio and sentence-level matched / missing points.
+    `model_side` / `student_side` are precomputed embeddings (see
+    services.embeddings.encode_evaluation); missing ones are encoded here.
+    `sim_matrix` is the sentence similarity matrix when the caller already
+    has it (batch_similarity_matrices).
+    """
     student_text = (student_text or "").strip()
     model_text = (model_text or "").strip()
 
@@ -43,17 +98,22 @@ def explain_answer(student_text: str, model_text: str) -> Dict:
         }
 
     # overall similarity
-    emb1 = embedder.encode(student_text, convert_to_tensor=True)
-    emb2 = embedder.encode(model_text, convert_to_tensor=True)
-    sim = util.cos_sim(emb1, emb2).item()
+    if student_side is None or model_side is None:
+        sides = encode_evaluation(student_text, model_text, model_side)
+        student_side = student_side or sides["student"]
+        model_side = sides["model"]
+
+    emb1 = student_side["text_emb"]
+    emb2 = model_side["text_emb"]
+    sim = torch.nn.functional.cosine_similarity(emb1, emb2, dim=-1).item()
     sim = max(0.0, min(sim, 1.0))
 
     # length ratio
     length_ratio = min(len(student_text) / max(len(model_text), 1), 1.0)
 
     # sentence matching
-    student_sents = split_sentences(student_text)
-    model_sents = split_sentences(model_text)
+    student_sents = student_side["sentences"]
+    model_sents = model_side["sentences"]
 
     if not student_sents or not model_sents:
         return {
@@ -64,26 +124,22 @@ def explain_answer(student_text: str, model_text: str) -> Dict:
             "explanation": "Not enough sentence content to compare."
         }
 
-    stu_emb = embedder.encode(student_sents, convert_to_tensor=True)
-    mod_emb = embedder.encode(model_sents, convert_to_tensor=True)
+    stu_emb = student_side["sentence_emb"]
+    mod_emb = model_side["sentence_emb"]
+
+    if sim_matrix is None:
+        sim_matrix = similarity_matrix(stu_emb, mod_emb)
 
     matched = []
     matched_model_idx = set()
 
-    SENT_MATCH_THRESHOLD = 0.35
-
-    for i, stu_sent in enumerate(student_sents):
-        sims = util.cos_sim(stu_emb[i], mod_emb)[0]
-        best_j = int(sims.argmax())
-        best_sim = float(sims[best_j].item())
-
-        if best_sim >= SENT_MATCH_THRESHOLD:
-            matched.append({
-                "student_sentence": stu_sent,
-                "model_sentence": model_sents[best_j],
-                "similarity": round(best_sim, 3)
-            })
-            matched_model_idx.add(best_j)
+    for i, j, pair_sim in align_sentences(sim_matrix):
+        matched.append({
+            "student_sentence": student_sents[i],
+            "model_sentence": model_sents[j],
+            "similarity": round(pair_sim, 3)
+        })
+        matched_model_idx.add(j)
 
     missing = []
     for j, mod_sent in enumerate(model_sents):
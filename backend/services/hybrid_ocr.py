@@ -1,32 +1,226 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import cv2
-import torch
 from PIL import Image
 from langdetect import detect
 
-import easyocr
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+from config import (
+    OCR_BATCH_SIZE,
+    OCR_CASCADE,
+    OCR_CASCADE_MIN_CONF,
+    OCR_DETECTOR,
+    OCR_LINE_MAX_ASPECT,
+    OCR_LINE_MAX_GAP,
+    OCR_LINE_MIN_Y_OVERLAP,
+    OCR_BACKEND,
+    OCR_MAX_NEW_TOKENS,
+    OCR_MERGE_LINES,
+    OCR_ONNX_DIR,
+    OCR_ONNX_QUANTIZE,
+    OCR_ONNX_THREADS,
+    OCR_DEFAULT_TIER,
+    OCR_DETECT_MAX_DIM,
+    OCR_EXPECTED_LINES,
+    OCR_LATENCY_BUDGET_S,
+    OCR_PAGE_PREPROCESS,
+    OCR_TARGET_TEXT_HEIGHT,
+    OCR_TIER_LINE_SECONDS,
+    OCR_TIERS,
+    OCR_USES_EASYOCR,
+    PDF_DPI,
+    PDF_MAX_PAGES,
+    PDF_WORKERS,
+)
+from services.admission import ocr_governor
+from services.image_io import as_image, debug_dump, resize_to_max_dim
+from services.line_splitter import detect_boxes_projection
+from services.model_registry import loading
+from services.pdf_handler import page_count, render_page
+from services.quality import assess_quality
+from services.timing import stage
+from services.trocr_backend import load_trocr_backend
 
 
 # -----------------------------
 # Setup
 # -----------------------------
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# EasyOCR (multilingual detector), loaded on first use
+_easy_reader = None
+_easy_reader_lock = threading.Lock()
+
+
+def get_easy_reader():
+    global _easy_reader
+    if _easy_reader is None:
+        with _easy_reader_lock:
+            if _easy_reader is None:
+                with loading("easyocr"):
+                    import easyocr
+                    import torch
+                    _easy_reader = easyocr.Reader(["en"], gpu=torch.cuda.is_available())
+    return _easy_reader
+
+# boxes handled per engine since process start
+_engine_counts = {"easyocr": 0, "trocr": 0}
+_engine_counts_lock = threading.Lock()
+
+
+def _count_engine(engine: str, n: int):
+    if n:
+        with _engine_counts_lock:
+            _engine_counts[engine] += n
+
+
+# -----------------------------
+# TrOCR model tiers
+# -----------------------------
+
+_tier_backends = {}
+_tier_load_lock = threading.Lock()
 
-trocr_processor = TrOCRProcessor.from_pretrained("microsoft/trocr-large-handwritten")
-trocr_model = VisionEncoderDecoderModel.from_pretrained(
-    "microsoft/trocr-large-handwritten"
-).to(DEVICE)
+_tier_lock = threading.Lock()
+_tier_line_seconds = dict(OCR_TIER_LINE_SECONDS)
+_tier_requests = {tier: 0 for tier in OCR_TIERS}
+_expected_lines = float(OCR_EXPECTED_LINES)
+_inflight = 0
 
-# EasyOCR (multilingual detector)
-easy_reader = easyocr.Reader(["en"], gpu=torch.cuda.is_available())
+
+def get_tier_backend(tier: str = OCR_DEFAULT_TIER):
+    """
+    Recognition backend for a tier, loaded on first use so that tiers
+    nobody selects never take memory.
+    """
+    if tier not in OCR_TIERS:
+        raise ValueError(f"Unknown OCR tier: {tier}")
+
+    backend = _tier_backends.get(tier)
+    if backend is None:
+        with _tier_load_lock:
+            backend = _tier_backends.get(tier)
+            if backend is None:
+                with loading(f"trocr-{tier}"):
+                    backend = load_trocr_backend(
+                        OCR_BACKEND, OCR_TIERS[tier], OCR_ONNX_DIR,
+                        quantize=OCR_ONNX_QUANTIZE, threads=OCR_ONNX_THREADS,
+                    )
+                _tier_backends[tier] = backend
+    return backend
+
+
+def select_tier(latency_budget_s: float = OCR_LATENCY_BUDGET_S, override: str = None) -> str:
+    """
+    Pick the recognition tier for one request.
+
+    An explicit `override` wins. Otherwise the best tier whose estimated
+    latency (observed seconds per line x expected lines x (queue depth + 1))
+    fits the budget is chosen, falling back to the cheapest tier. The queue
+    depth counts the requests running OCR and those still waiting for an
+    OCR admission slot, so a backlog in the governor downgrades the tier.
+    """
+    if override:
+        if override not in OCR_TIERS:
+            raise ValueError(f"Unknown OCR tier: {override}")
+        return override
+
+    if not latency_budget_s:
+        return OCR_DEFAULT_TIER
+
+    waiting = ocr_governor.waiting()
+    with _tier_lock:
+        queue_depth = _inflight + waiting
+        expected_lines = _expected_lines
+        line_seconds = dict(_tier_line_seconds)
+
+    tiers = list(OCR_TIERS)
+    for tier in tiers:
+        estimate = line_seconds.get(tier, 1.0) * expected_lines * (queue_depth + 1)
+        if estimate <= latency_budget_s:
+            return tier
+
+    return tiers[-1]
+
+
+def _observe(tier: str, n_lines: int, seconds: float):
+    # exponential moving averages feeding select_tier
+    global _expected_lines
+    with _tier_lock:
+        _expected_lines = 0.8 * _expected_lines + 0.2 * n_lines
+        if n_lines:
+            per_line = seconds / n_lines
+            _tier_line_seconds[tier] = 0.8 * _tier_line_seconds.get(tier, per_line) + 0.2 * per_line
+
+
+class _InFlight:
+    # counts OCR requests currently running, i.e. the queue depth seen by select_tier
+    def __enter__(self):
+        global _inflight
+        with _tier_lock:
+            _inflight += 1
+
+    def __exit__(self, *exc):
+        global _inflight
+        with _tier_lock:
+            _inflight -= 1
+
+
+def get_ocr_stats() -> dict:
+    with _engine_counts_lock:
+        counts = dict(_engine_counts)
+    with _tier_lock:
+        return {
+            "boxes_by_engine": counts,
+            "in_flight": _inflight,
+            "expected_lines": round(_expected_lines, 1),
+            "tiers": {
+                tier: {
+                    "loaded": tier in _tier_backends,
+                    "requests": _tier_requests.get(tier, 0),
+                    "line_seconds": round(_tier_line_seconds.get(tier, 0.0), 3),
+                }
+                for tier in OCR_TIERS
+            },
+        }
 
 
 # -----------------------------
-# Preprocess crop
+# Page preprocessing
 # -----------------------------
 
+def preprocess_page(img, strategy: str = OCR_PAGE_PREPROCESS):
+    """
+    Grayscale + clean-up of the whole page, done once per page.
+    Crops are then sliced from the result as views, so overlapping boxes
+    no longer pay for denoising the same pixels again.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+    if strategy == "none":
+        return gray
+    if strategy == "nlm":
+        gray = cv2.fastNlMeansDenoising(gray, None, 30, 7, 21)
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return thresh
+    if strategy == "otsu":
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return thresh
+    if strategy == "adaptive":
+        return cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10
+        )
+
+    raise ValueError(f"Unknown page preprocessing strategy: {strategy}")
+
+
 def preprocess_crop(crop):
+    """
+    Per-crop work is limited to size checks: `crop` is a view into the
+    preprocessed page, and the TrOCR processor does the resizing.
+    """
     if crop is None or crop.size == 0:
         return None
 
@@ -34,51 +228,120 @@ def preprocess_crop(crop):
     if crop.shape[0] < 10 or crop.shape[1] < 20:
         return None
 
-    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-    gray = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-    gray = cv2.fastNlMeansDenoising(gray, None, 30, 7, 21)
-    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    return thresh
-
+    return crop
 
 
 # -----------------------------
-# Detect text boxes using EasyOCR
+# Detect text boxes
 # -----------------------------
 
-def detect_boxes_easyocr(image_path: str):
-    img = cv2.imread(image_path)
-    if img is None:
-        raise ValueError("Image not found")
+# minimum box size in original page pixels
+MIN_BOX_W = 30
+MIN_BOX_H = 15
 
-    results = easy_reader.readtext(image_path)
 
-    boxes = []
-    for (bbox, text, conf) in results:
-        xs = [p[0] for p in bbox]
-        ys = [p[1] for p in bbox]
-        x1, x2 = int(min(xs)), int(max(xs))
-        y1, y2 = int(min(ys)), int(max(ys))
+def _polygon_to_box(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))
 
-        if (x2 - x1) < 30 or (y2 - y1) < 15:
+
+def _filter_boxes(boxes, scale: float = 1.0):
+    # `scale`: how far the detection image was downscaled from the page
+    min_w, min_h = MIN_BOX_W * scale, MIN_BOX_H * scale
+    kept = []
+    for (x1, y1, x2, y2) in boxes:
+        x1, y1 = max(0, x1), max(0, y1)
+        if (x2 - x1) < min_w or (y2 - y1) < min_h:
             continue
+        kept.append((x1, y1, x2, y2))
+
+    kept.sort(key=lambda b: b[1])  # top-to-bottom
+    return kept
+
+
+def _easyocr_input(img):
+    # EasyOCR loads paths as RGB; arrays are used as given
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if img.ndim == 3 else img
 
-        boxes.append((x1, y1, x2, y2))
 
-    boxes.sort(key=lambda b: b[1])  # top-to-bottom
-    return boxes
+def detect_regions_easyocr(image, scale: float = 1.0):
+    """
+    EasyOCR detection + recognition on a path or BGR array. Returns
+    (box, text, confidence) tuples, filtered and ordered like the
+    detector-only boxes. `scale` is the factor `image` was downscaled by
+    from the page, so the minimum box size still means page pixels.
+    """
+    image = as_image(image)
+    if image is None:
+        raise ValueError("Image not found")
 
+    regions = []
+    for (bbox, text, conf) in get_easy_reader().readtext(_easyocr_input(image)):
+        box = _filter_boxes([_polygon_to_box(bbox)], scale)
+        if box:
+            regions.append((box[0], text.strip(), float(conf)))
 
+    regions.sort(key=lambda r: r[0][1])  # top-to-bottom
+    return regions
+
+
+def detect_boxes_easyocr(image, recognise: bool = False, scale: float = 1.0):
+    """
+    EasyOCR text localisation. `image` is a path or a BGR array.
 
-def sort_boxes_reading_order(boxes, y_threshold=25):
+    By default only the CRAFT detector runs (`Reader.detect`); its boxes are
+    the same ones `readtext` would return, without the CRNN recognition pass
+    whose text we never used. `recognise=True` keeps the old readtext path.
+    """
+    if recognise:
+        return [box for (box, text, conf) in detect_regions_easyocr(image, scale)]
+
+    image = as_image(image)
+    if image is None:
+        raise ValueError("Image not found")
+
+    horizontal_list, free_list = get_easy_reader().detect(_easyocr_input(image))
+
+    boxes = [(int(x_min), int(y_min), int(x_max), int(y_max))
+             for (x_min, x_max, y_min, y_max) in horizontal_list[0]]
+    boxes += [_polygon_to_box(poly) for poly in free_list[0]]
+
+    return _filter_boxes(boxes, scale)
+
+
+def detect_boxes(img, detector: str = OCR_DETECTOR, scale: float = 1.0):
+    """
+    Box list (x1, y1, x2, y2) for a BGR page using the configured detector.
+    `scale` is the factor `img` was downscaled by from the page.
+    """
+    if detector == "projection":
+        return _filter_boxes(detect_boxes_projection(img), scale)
+    if detector == "easyocr-readtext":
+        return detect_boxes_easyocr(img, recognise=True, scale=scale)
+    if detector == "easyocr":
+        return detect_boxes_easyocr(img, scale=scale)
+
+    raise ValueError(f"Unknown OCR detector: {detector}")
+
+
+
+def sort_boxes_reading_order(boxes, y_threshold=25, key=None):
     """
     Sort boxes into proper reading order:
     - group into lines by y
     - inside each line sort by x
+    `key` maps an item to its (x1, y1, x2, y2) box when sorting richer records.
     """
     if not boxes:
         return []
 
+    if key is not None:
+        order = sort_boxes_reading_order(
+            [(*key(item), i) for i, item in enumerate(boxes)], y_threshold
+        )
+        return [boxes[b[4]] for b in order]
+
     # Sort by top y first
     boxes = sorted(boxes, key=lambda b: b[1])
 
@@ -106,66 +369,515 @@ def sort_boxes_reading_order(boxes, y_threshold=25):
     return sorted_boxes
 
 # -----------------------------
-# TrOCR line OCR using detected boxes
+# Resolution normalisation
 # -----------------------------
 
-def run_trocr_lines(image_path: str) -> str:
-    img = cv2.imread(image_path)
-    if img is None:
-        return ""
+def _scale_box(box, factor):
+    return tuple(int(round(v * factor)) for v in box)
 
-    h, w = img.shape[:2]
-    boxes = detect_boxes_easyocr(image_path)
-    boxes = sort_boxes_reading_order(boxes)
 
+def recognition_scale(boxes, target_text_height: int = OCR_TARGET_TEXT_HEIGHT) -> float:
+    """
+    Downscale factor (<= 1) that brings the median line height close to
+    `target_text_height`. TrOCR resizes crops to 384 px anyway, so extra
+    resolution only costs preprocessing time and memory.
+    """
+    heights = sorted(y2 - y1 for (x1, y1, x2, y2) in boxes)
+    if not heights:
+        return 1.0
 
-    if not boxes:
-        return ""
+    median = heights[len(heights) // 2]
+    return min(1.0, target_text_height / max(median, 1))
 
-    final_lines = []
 
-    for (x1, y1, x2, y2) in boxes:
+# -----------------------------
+# Line assembly
+# -----------------------------
 
-        # clamp to image size
-        x1 = max(0, min(w - 1, x1))
-        x2 = max(0, min(w - 1, x2))
-        y1 = max(0, min(h - 1, y1))
-        y2 = max(0, min(h - 1, y2))
+def _same_line(a, b, min_overlap, max_gap, max_aspect):
+    """
+    True if box `b` continues the line ending with box `a` (b to the right of a).
+    """
+    ax1, ay1, ax2, ay2 = a
+    bx1, by1, bx2, by2 = b
 
-        if x2 <= x1 or y2 <= y1:
-            continue
+    ha, hb = ay2 - ay1, by2 - by1
+    overlap = min(ay2, by2) - max(ay1, by1)
+    if overlap < min_overlap * min(ha, hb):
+        return False
+
+    # b must start at or right of the line's start: a box further left
+    # (a slanted line split by the reading-order sort) would have its text
+    # appended after the line's text, out of order
+    if bx1 < ax1:
+        return False
+
+    height = max(ha, hb)
+    if bx1 - ax2 > max_gap * height:
+        return False
+
+    merged_w = max(ax2, bx2) - min(ax1, bx1)
+    merged_h = max(ay2, by2) - min(ay1, by1)
+    return merged_w <= max_aspect * merged_h
+
+
+def merge_regions_into_lines(regions, min_overlap=OCR_LINE_MIN_Y_OVERLAP,
+                             max_gap=OCR_LINE_MAX_GAP, max_aspect=OCR_LINE_MAX_ASPECT):
+    """
+    Merge (box, text, confidence) regions that sit on the same text line.
+    Input must already be in reading order. Merged text is space-joined and
+    the merged confidence is the lowest of its parts.
+    """
+    lines = []
+
+    for (box, text, conf) in regions:
+        if lines:
+            line_box, line_text, line_conf = lines[-1]
+            if _same_line(line_box, box, min_overlap, max_gap, max_aspect):
+                merged_box = (
+                    min(line_box[0], box[0]), min(line_box[1], box[1]),
+                    max(line_box[2], box[2]), max(line_box[3], box[3]),
+                )
+                merged_text = " ".join(t for t in (line_text, text) if t)
+                lines[-1] = (merged_box, merged_text, min(line_conf, conf))
+                continue
+
+        lines.append((box, text, conf))
+
+    return lines
+
+
+def merge_boxes_into_lines(boxes, **rules):
+    """
+    Box-only form of merge_regions_into_lines.
+    """
+    regions = merge_regions_into_lines([(b, "", 0.0) for b in boxes], **rules)
+    return [box for (box, text, conf) in regions]
+
+
+# -----------------------------
+# Crop extraction
+# -----------------------------
+
+def crop_line(page, box):
+    """
+    PIL crop for one box of a preprocessed page, or None if the box is unusable.
+    """
+    h, w = page.shape[:2]
+    x1, y1, x2, y2 = box
+
+    # clamp to image size
+    x1 = max(0, min(w - 1, x1))
+    x2 = max(0, min(w - 1, x2))
+    y1 = max(0, min(h - 1, y1))
+    y2 = max(0, min(h - 1, y2))
 
-        crop = img[y1:y2, x1:x2]
+    if x2 <= x1 or y2 <= y1:
+        return None
+
+    crop = page[y1:y2, x1:x2]
+
+    processed = preprocess_crop(crop)
+    if processed is None:
+        return None
+
+    return Image.fromarray(processed).convert("RGB")
+
+
+def extract_line_crops(img, boxes, strategy: str = OCR_PAGE_PREPROCESS):
+    """
+    Preprocess the page once and cut the boxes out of it.
+    Returns PIL images in the same order as `boxes`; unusable crops are dropped.
+    """
+    page = preprocess_page(img, strategy)
+    crops = []
+    for box in boxes:
+        crop = crop_line(page, box)
+        if crop is not None:
+            crops.append(crop)
+    return crops
+
+
+# -----------------------------
+# Batched TrOCR decoding
+# -----------------------------
+
+def recognise_crops(images, batch_size: int = OCR_BATCH_SIZE, backend=None):
+    """
+    Decode line images with TrOCR, `batch_size` crops per generate() call.
+    The processor resizes every crop to the same input size, so a batch is
+    one stacked tensor; generate() pads the shorter outputs.
+    Returned texts keep the order of `images`.
+    """
+    backend = backend or get_tier_backend()
+    batch_size = max(1, int(batch_size or 1))
+    texts = []
+
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size]
+        texts.extend(backend.recognise(batch, max_new_tokens=OCR_MAX_NEW_TOKENS))
+
+    return texts
+
+
+# -----------------------------
+# Line OCR using detected boxes
+# -----------------------------
 
-        if crop is None or crop.size == 0:
+def iter_ocr_lines(img, batch_size: int = OCR_BATCH_SIZE, cascade: bool = OCR_CASCADE,
+                   min_conf: float = OCR_CASCADE_MIN_CONF, merge_lines: bool = OCR_MERGE_LINES,
+                   timings: dict = None, tier: str = OCR_DEFAULT_TIER,
+                   cancel=None, on_detect=None, observed: list = None):
+    """
+    Generator form of ocr_lines: yields each line dict, in reading order,
+    as soon as the TrOCR batch holding it is decoded. `on_detect(n_boxes)`
+    is called once detection is done. If the threading.Event `cancel` is
+    set, no further batches are decoded. With an `observed` list, the
+    (lines, seconds) latency sample is appended to it instead of being fed
+    to select_tier here (PDF workers send it back to the parent).
+    """
+    with stage(timings, "normalise"):
+        det_img, det_scale = resize_to_max_dim(img, OCR_DETECT_MAX_DIM)
+
+    with stage(timings, "detect"):
+        if cascade:
+            regions = detect_regions_easyocr(det_img, det_scale)
+        else:
+            regions = [(box, "", 0.0) for box in detect_boxes(det_img, scale=det_scale)]
+
+        regions = sort_boxes_reading_order(regions, key=lambda r: r[0])
+        if merge_lines:
+            regions = merge_regions_into_lines(regions)
+
+    if on_detect is not None:
+        on_detect(len(regions))
+    if not regions:
+        return
+
+    regions = [(_scale_box(box, 1.0 / det_scale), text, conf) for (box, text, conf) in regions]
+
+    # recognition source: original pixels, downscaled only if lines are huge
+    rec_scale = recognition_scale([box for (box, _, _) in regions])
+
+    page = None  # preprocessed on first use; a fully confident cascade page skips it
+    lines = []
+    pending = []  # (index into lines, crop) for TrOCR
+
+    for (box, text, conf) in regions:
+        if cascade and text and conf >= min_conf:
+            lines.append({"box": box, "text": text, "engine": "easyocr"})
             continue
 
-        processed = preprocess_crop(crop)
-        if processed is None:
+        if page is None:
+            with stage(timings, "preprocess"):
+                rec_img = img
+                if rec_scale < 1.0:
+                    rec_img = cv2.resize(img, None, fx=rec_scale, fy=rec_scale,
+                                         interpolation=cv2.INTER_AREA)
+                page = preprocess_page(rec_img)
+                debug_dump(page, "page")
+
+        with stage(timings, "crop"):
+            crop = crop_line(page, _scale_box(box, rec_scale))
+        if crop is None:
             continue
-        pil_img = Image.fromarray(processed).convert("RGB")
 
-        pixel_values = trocr_processor(images=pil_img, return_tensors="pt").pixel_values.to(DEVICE)
+        pending.append((len(lines), crop))
+        lines.append({"box": box, "text": "", "engine": "trocr"})
 
-        generated_ids = trocr_model.generate(pixel_values, max_new_tokens=128)
-        text = trocr_processor.batch_decode(generated_ids, skip_special_tokens=True)[0].strip()
+    backend = get_tier_backend(tier) if pending else None
+    batch_size = max(1, int(batch_size or 1))
+    emitted = 0  # lines[:emitted] have been yielded (or skipped as empty)
+    decoded = 0
+    rec_seconds = 0.0
+
+    try:
+        for start in range(0, len(pending), batch_size):
+            if cancel is not None and cancel.is_set():
+                return
+
+            batch = pending[start:start + batch_size]
+            t0 = time.perf_counter()
+            with stage(timings, "recognise"):
+                texts = backend.recognise([crop for (_, crop) in batch],
+                                          max_new_tokens=OCR_MAX_NEW_TOKENS)
+            rec_seconds += time.perf_counter() - t0
+            decoded += len(batch)
+
+            for (idx, _), text in zip(batch, texts):
+                lines[idx]["text"] = text
+
+            # every line before the next undecoded crop is final now
+            ready = pending[start + batch_size][0] if start + batch_size < len(pending) else len(lines)
+            for line in lines[emitted:ready]:
+                if line["text"]:
+                    yield line
+            emitted = ready
+
+        # cascade lines after the last TrOCR crop (or a page with none)
+        for line in lines[emitted:]:
+            if line["text"]:
+                yield line
+    finally:
+        if decoded and observed is not None:
+            observed.append((decoded, rec_seconds))
+        elif decoded:
+            _observe(tier, decoded, rec_seconds)
+        _count_engine("easyocr", sum(1 for line in lines if line["engine"] == "easyocr"))
+        _count_engine("trocr", decoded)
+
+
+def ocr_lines(img, batch_size: int = OCR_BATCH_SIZE, cascade: bool = OCR_CASCADE,
+              min_conf: float = OCR_CASCADE_MIN_CONF, merge_lines: bool = OCR_MERGE_LINES,
+              timings: dict = None, tier: str = OCR_DEFAULT_TIER, observed: list = None):
+    """
+    Recognise every text box on a BGR page, in reading order, with the
+    TrOCR model of the given `tier`.
+    With `merge_lines`, word boxes on one text line are merged first so
+    TrOCR sees whole lines, as it was trained on.
+
+    Returns a list of {"box", "text", "engine"} dicts. Without `cascade` all
+    boxes go to TrOCR. With `cascade`, EasyOCR reads the page and boxes it
+    read with confidence >= `min_conf` keep its text; only the rest are
+    decoded by TrOCR.
+
+    Detection runs on a copy no larger than OCR_DETECT_MAX_DIM; boxes are
+    mapped back and crops come from a source scaled to OCR_TARGET_TEXT_HEIGHT.
+    Returned boxes are in `img` coordinates.
+
+    If `timings` is a dict, per-stage wall times (seconds) are added to it.
+    """
+    return list(iter_ocr_lines(img, batch_size, cascade, min_conf, merge_lines, timings, tier,
+                               observed=observed))
+
+
+def engine_label(lines, cascade: bool = OCR_CASCADE, tier: str = OCR_DEFAULT_TIER) -> str:
+    """
+    Value stored in Result.ocr_engine: the TrOCR tier (and backend, if not
+    PyTorch), or the per-box engine mix when the cascade is on.
+    e.g. "trocr-large-lines", "trocr-base-onnx-int8-lines",
+    "cascade:easyocr=12,trocr-small=5".
+    """
+    name = f"trocr-{tier}"
+    if OCR_BACKEND != "torch":
+        name += "-onnx-int8" if OCR_ONNX_QUANTIZE else "-onnx"
 
-        if text:
-            final_lines.append(text)
+    if not cascade:
+        return f"{name}-lines"
 
-    return "\n".join(final_lines)
+    n_easy = sum(1 for line in lines if line["engine"] == "easyocr")
+    n_trocr = sum(1 for line in lines if line["engine"] == "trocr")
+    return f"cascade:easyocr={n_easy},{name}={n_trocr}"
+
+
+def iter_trocr_lines(image, batch_size: int = OCR_BATCH_SIZE, cascade: bool = OCR_CASCADE,
+                     tier: str = OCR_DEFAULT_TIER, cancel=None, on_detect=None):
+    """
+    Line dicts of a page as they are decoded (see iter_ocr_lines).
+    """
+    img = as_image(image)
+    if img is None:
+        return
+
+    yield from iter_ocr_lines(img, batch_size=batch_size, cascade=cascade, tier=tier,
+                              cancel=cancel, on_detect=on_detect)
+
+
+def run_trocr_lines(image, batch_size: int = OCR_BATCH_SIZE,
+                    cascade: bool = OCR_CASCADE, tier: str = OCR_DEFAULT_TIER) -> str:
+    lines = iter_trocr_lines(image, batch_size=batch_size, cascade=cascade, tier=tier)
+    return "\n".join(line["text"] for line in lines)
 
 
 # -----------------------------
 # Final function used by backend
 # -----------------------------
 
-def hybrid_ocr(image_path: str):
-    text = run_trocr_lines(image_path)
-
+def _detect_language(text: str) -> str:
     try:
-        lang = detect(text) if text else "unknown"
+        return detect(text) if text else "unknown"
     except:
-        lang = "unknown"
+        return "unknown"
+
+
+def _begin_request(tier: str = None) -> str:
+    tier = select_tier(override=tier)
+    with _tier_lock:
+        _tier_requests[tier] += 1
+    return tier
 
-    return text, "trocr-large-lines", lang
+
+def hybrid_ocr_lines(image, cascade: bool = OCR_CASCADE, tier: str = None):
+    """
+    Like hybrid_ocr, but returns the line dicts (box, text, engine) instead
+    of the joined text, for callers that segment the page by region.
+    """
+    img = as_image(image)
+
+    # admission first: a rejected request never counts towards a tier
+    with ocr_governor.slot():
+        tier = _begin_request(tier)
+        with _InFlight():
+            lines = ocr_lines(img, cascade=cascade, tier=tier) if img is not None else []
+
+    text = "\n".join(line["text"] for line in lines)
+    return lines, engine_label(lines, cascade, tier), _detect_language(text)
+
+
+def hybrid_ocr_stream(image, cascade: bool = OCR_CASCADE, tier: str = None,
+                      cancel=None, on_detect=None, on_admit=None):
+    """
+    Streaming hybrid_ocr_lines: yields ("line", line dict) per recognised
+    line as its batch is decoded, then ("done", (lines, engine, language)).
+    The OCR admission slot is held until the generator finishes or is closed;
+    on_admit() is called once it has been granted.
+    """
+    with ocr_governor.slot():
+        if on_admit is not None:
+            on_admit()
+        tier = _begin_request(tier)
+        lines = []
+        with _InFlight():
+            for line in iter_trocr_lines(image, cascade=cascade, tier=tier,
+                                         cancel=cancel, on_detect=on_detect):
+                lines.append(line)
+                yield "line", line
+
+    text = "\n".join(line["text"] for line in lines)
+    yield "done", (lines, engine_label(lines, cascade, tier), _detect_language(text))
+
+
+def hybrid_ocr(image, cascade: bool = OCR_CASCADE, tier: str = None):
+    """
+    OCR one page. `image` is a file path or an already decoded BGR array;
+    either way the page is decoded once and passed through every stage.
+    `tier` forces a model tier; by default select_tier picks one.
+    """
+    lines, engine, lang = hybrid_ocr_lines(image, cascade, tier)
+    return "\n".join(line["text"] for line in lines), engine, lang
+
+
+# -----------------------------
+# Multi-page PDFs
+# -----------------------------
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _init_pdf_worker(threads: int):
+    # fresh process (forkserver / spawn): set the thread budget, then load
+    # this worker's models once instead of on its first page
+    global OCR_ONNX_THREADS
+    import torch
+    torch.set_num_threads(threads)
+    if not OCR_ONNX_THREADS:
+        OCR_ONNX_THREADS = threads
+
+    if OCR_USES_EASYOCR:
+        get_easy_reader()
+    get_tier_backend(OCR_DEFAULT_TIER)
+
+
+def _pdf_worker_threads() -> int:
+    """
+    Threads per PDF worker: the cores the parent's own torch threads leave
+    free, split between the workers (at least one each).
+    """
+    import torch
+    free = (os.cpu_count() or 1) - torch.get_num_threads()
+    return max(1, free // max(PDF_WORKERS, 1))
+
+
+def _get_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # never fork here: by the first PDF request this process runs
+            # torch / OpenMP pools, the embed batcher and request threads.
+            # forkserver (or spawn) workers start clean and load their own models.
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=ctx,
+                initializer=_init_pdf_worker,
+                initargs=(_pdf_worker_threads(),),
+            )
+        return _pdf_pool
+
+
+def ocr_pdf_page(pdf_path: str, page_num: int, dpi: int = PDF_DPI,
+                 cascade: bool = OCR_CASCADE, tier: str = OCR_DEFAULT_TIER,
+                 observed: list = None):
+    """
+    Render and OCR one page inside the calling process. Blank pages are
+    skipped after the cheap quality check. Returns the page's line dicts.
+    """
+    img = render_page(pdf_path, page_num, dpi)
+    # an empty rendered page has no ink and no faint marks: "blank"
+    if assess_quality(img)["reason"] == "blank":
+        return []
+    return ocr_lines(img, cascade=cascade, tier=tier, observed=observed)
+
+
+def _ocr_pdf_page_task(args):
+    # (lines, latency samples): the samples are applied in the parent,
+    # where select_tier runs
+    observed = []
+    return ocr_pdf_page(*args, observed=observed), observed
+
+
+def hybrid_ocr_pdf(pdf_path: str, dpi: int = PDF_DPI, cascade: bool = OCR_CASCADE,
+                   tier: str = None, cancel=None, on_admit=None):
+    """
+    OCR every page of a PDF answer booklet and join the page texts in order.
+    Pages are rendered inside the workers, so at most PDF_WORKERS pages are
+    held in memory at any time. Once the threading.Event `cancel` is set,
+    pages not yet started are dropped and the pages done so far returned.
+    on_admit() is called when the OCR admission slot has been granted.
+    """
+    n_pages = page_count(pdf_path)
+    if n_pages > PDF_MAX_PAGES:
+        raise ValueError(f"PDF has {n_pages} pages (max {PDF_MAX_PAGES})")
+
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
+    with ocr_governor.slot():
+        if on_admit is not None:
+            on_admit()
+        tier = _begin_request(tier)
+        tasks = [(pdf_path, n, dpi, cascade, tier) for n in range(n_pages)]
+
+        with _InFlight():
+            if PDF_WORKERS > 0 and n_pages > 1:
+                futures = [_get_pdf_pool().submit(_ocr_pdf_page_task, t) for t in tasks]
+                results = []
+                for future in futures:
+                    if cancelled():
+                        for f in futures:
+                            f.cancel()
+                        break
+                    results.append(future.result())
+
+                # engine counters are per process; add the workers' lines here
+                for lines, _ in results:
+                    _count_engine("easyocr", sum(1 for l in lines if l["engine"] == "easyocr"))
+                    _count_engine("trocr", sum(1 for l in lines if l["engine"] == "trocr"))
+            else:
+                results = []
+                for t in tasks:
+                    if cancelled():
+                        break
+                    results.append(_ocr_pdf_page_task(t))
+
+        pages = [lines for lines, _ in results]
+        for _, observed in results:
+            for n_lines, seconds in observed:
+                _observe(tier, n_lines, seconds)
+
+    all_lines = [line for lines in pages for line in lines]
+    text = "\n\n".join("\n".join(l["text"] for l in lines) for lines in pages if lines)
+
+    return text, engine_label(all_lines, cascade, tier), _detect_language(text)
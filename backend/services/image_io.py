@@ -0,0 +1,131 @@
+import io
+import os
+import uuid
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from config import DEBUG_DUMP_DIR, OCR_MAX_DECODE_PIXELS
+
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+# non-JPEG formats are fully decoded before any downscaling: refuse frames
+# larger than this instead of materialising them (whatever max_pixels the
+# caller asked for, e.g. the small upload preview)
+NON_JPEG_MAX_PIXELS = 4 * OCR_MAX_DECODE_PIXELS
+
+
+def _reduce_factor(im, max_pixels: int):
+    """
+    IMREAD_REDUCED_* factor for a PIL-opened header, or None if the image
+    must not be decoded (a non-JPEG frame above NON_JPEG_MAX_PIXELS, which
+    no decoding flag would shrink).
+    """
+    w, h = im.size
+    if im.format != "JPEG" and w * h > NON_JPEG_MAX_PIXELS:
+        return None
+
+    factor = 1
+    while factor < 8 and (w // factor) * (h // factor) > max_pixels:
+        factor *= 2
+    return factor
+
+
+def resize_to_max_pixels(img, max_pixels: int):
+    h, w = img.shape[:2]
+    if h * w <= max_pixels:
+        return img
+
+    scale = (max_pixels / (h * w)) ** 0.5
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def resize_to_max_dim(img, max_dim: int):
+    """
+    Downscale so the longest side is at most `max_dim`.
+    Returns (image, scale) where scale <= 1 maps original coords to the result.
+    """
+    h, w = img.shape[:2]
+    scale = min(1.0, max_dim / max(h, w))
+    if scale >= 1.0:
+        return img, 1.0
+
+    resized = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return resized, scale
+
+
+def load_image(path: str, max_pixels: int = OCR_MAX_DECODE_PIXELS):
+    """
+    Decode an image as BGR with at most `max_pixels` pixels.
+
+    The header is read first so oversized photos are decoded with OpenCV's
+    reduced-resolution flags instead of materialising the full 12-48 MP
+    frame. Only JPEG is scaled during decoding: other formats (PNG, WebP,
+    TIFF) ignore the flags and are fully decoded, then downscaled, so they
+    are refused above NON_JPEG_MAX_PIXELS. Returns None if
+    unreadable or refused.
+    """
+    try:
+        with Image.open(path) as im:
+            factor = _reduce_factor(im, max_pixels)
+    except Exception:
+        return None
+    if factor is None:
+        return None
+
+    img = cv2.imread(path, _REDUCED_FLAGS[factor])
+    if img is None:
+        return None
+
+    return resize_to_max_pixels(img, max_pixels)
+
+
+def decode_image(data: bytes, max_pixels: int = OCR_MAX_DECODE_PIXELS):
+    """
+    In-memory counterpart of load_image for uploaded bytes.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            factor = _reduce_factor(im, max_pixels)
+    except Exception:
+        return None
+    if factor is None:
+        return None
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+    img = cv2.imdecode(buf, _REDUCED_FLAGS[factor])
+    if img is None:
+        return None
+
+    return resize_to_max_pixels(img, max_pixels)
+
+
+def as_image(image):
+    """
+    Accept a path or an already decoded BGR array; decode paths exactly once.
+    """
+    if isinstance(image, str):
+        return load_image(image)
+    return image
+
+
+def debug_dump(img, name: str):
+    """
+    Write `img` as PNG only when debug dumping is enabled (DEBUG_DUMP_DIR).
+    Each call gets a unique file name, so concurrent requests never clash.
+    Returns the written path or None.
+    """
+    if not DEBUG_DUMP_DIR:
+        return None
+
+    os.makedirs(DEBUG_DUMP_DIR, exist_ok=True)
+    path = os.path.join(DEBUG_DUMP_DIR, f"{uuid.uuid4().hex[:12]}_{name}.png")
+    cv2.imwrite(path, img)
+    return path
@@ -0,0 +1,284 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from config import JOB_HEARTBEAT_S, JOB_MAX_ATTEMPTS, JOB_POLL_S, JOB_STALE_S
+from database import SessionLocal
+from models import EvalJob
+
+# Job states: queued -> running -> done | failed. A running job whose
+# worker stops heart-beating is put back to queued (or failed after
+# JOB_MAX_ATTEMPTS). Evaluation code is imported inside the worker loop
+# only, so the API side of the queue stays free of the inference stacks.
+
+# retries of the completion commit (SQLite "database is locked"), so a
+# finished evaluation is not thrown away for a busy writer lock
+_COMMIT_ATTEMPTS = 3
+# longest sleep of a worker whose loop keeps hitting DB errors
+_MAX_ERROR_SLEEP_S = 30.0
+
+
+def enqueue_job(db: Session, file_path: str, model_answer_id: int, tier: str = None) -> EvalJob:
+    job = EvalJob(file_path=file_path, model_answer_id=model_answer_id, ocr_tier=tier, state="queued")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_job(db: Session, worker_id: str):
+    """
+    Atomically move the oldest queued job to running for `worker_id`.
+    The conditional UPDATE makes sure two workers never claim the same job.
+    """
+    while True:
+        job_id = (
+            db.query(EvalJob.id)
+            .filter(EvalJob.state == "queued")
+            .order_by(EvalJob.id)
+            .limit(1)
+            .scalar()
+        )
+        if job_id is None:
+            return None
+
+        now = datetime.utcnow()
+        claimed = (
+            db.query(EvalJob)
+            .filter(EvalJob.id == job_id, EvalJob.state == "queued")
+            .update({
+                "state": "running",
+                "worker_id": worker_id,
+                "attempts": EvalJob.attempts + 1,
+                "started_at": now,
+                "heartbeat_at": now,
+            }, synchronize_session=False)
+        )
+        db.commit()
+
+        if claimed:
+            return db.query(EvalJob).filter(EvalJob.id == job_id).first()
+
+
+def requeue_stale(db: Session) -> int:
+    """
+    Jobs whose worker crashed (no heartbeat for JOB_STALE_S) go back to
+    the queue, or fail once they used up JOB_MAX_ATTEMPTS.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_S)
+    stale = db.query(EvalJob).filter(EvalJob.state == "running", EvalJob.heartbeat_at < cutoff)
+
+    failed = stale.filter(EvalJob.attempts >= JOB_MAX_ATTEMPTS).update({
+        "state": "failed",
+        "error": json.dumps("Worker stopped responding"),
+        "finished_at": datetime.utcnow(),
+    }, synchronize_session=False)
+    requeued = stale.filter(EvalJob.attempts < JOB_MAX_ATTEMPTS).update({
+        "state": "queued",
+        "worker_id": None,
+    }, synchronize_session=False)
+    db.commit()
+
+    return failed + requeued
+
+
+def _owned(db: Session, job_id: int, worker_id: str):
+    # the job row, as long as it is still running on this worker; once the
+    # stale sweep has requeued or failed it, the job is no longer ours
+    return db.query(EvalJob).filter(
+        EvalJob.id == job_id, EvalJob.worker_id == worker_id, EvalJob.state == "running"
+    )
+
+
+def _fail_job(db: Session, job_id: int, worker_id: str, error, retry: bool) -> bool:
+    """
+    Requeue (when `retry` and attempts are left) or fail a job this worker
+    still owns. Returns False if it lost the job in the meantime.
+    """
+    owned = _owned(db, job_id, worker_id)
+    updated = 0
+    if retry:
+        updated = owned.filter(EvalJob.attempts < JOB_MAX_ATTEMPTS).update({
+            "state": "queued",
+            "worker_id": None,
+            "error": json.dumps(error),
+        }, synchronize_session=False)
+    if not updated:
+        updated = owned.update({
+            "state": "failed",
+            "error": json.dumps(error),
+            "finished_at": datetime.utcnow(),
+        }, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+
+class _Heartbeat:
+    # refreshes heartbeat_at from its own session while a job runs
+    def __init__(self, job_id: int, worker_id: str):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(JOB_HEARTBEAT_S):
+            db = SessionLocal()
+            try:
+                db.query(EvalJob).filter(
+                    EvalJob.id == self.job_id, EvalJob.worker_id == self.worker_id
+                ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                # e.g. "database is locked": try again on the next beat
+                # rather than let the job go stale while it still runs
+                db.rollback()
+                print(f"⚠️ Heartbeat for job {self.job_id} failed: {e}")
+            finally:
+                db.close()
+
+    def __enter__(self):
+        self._thread.start()
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(db: Session, job: EvalJob):
+    from services.evaluation import EvaluationError, remove_upload, stage_evaluation, stage_result
+
+    # read once: after a rollback the ORM would reload them from a row
+    # another worker may have claimed since
+    job_id, worker_id, file_path = job.id, job.worker_id, job.file_path
+    model_answer_id = job.model_answer_id
+
+    with _Heartbeat(job_id, worker_id):
+        try:
+            row, response = stage_evaluation(db, file_path, model_answer_id, job.ocr_tier)
+        except EvaluationError as e:
+            # bad input: retrying would fail the same way
+            db.rollback()
+            if _fail_job(db, job_id, worker_id, e.detail, retry=False):
+                remove_upload(file_path)
+            return
+        except Exception as e:
+            db.rollback()
+            _fail_job(db, job_id, worker_id, str(e), retry=True)
+            return
+
+        for attempt in range(_COMMIT_ATTEMPTS):
+            try:
+                done = _complete_job(db, job_id, worker_id, row, response)
+                break
+            except OperationalError as e:
+                db.rollback()
+                if attempt + 1 == _COMMIT_ATTEMPTS:
+                    raise
+                print(f"⚠️ Completing job {job_id} failed ({e}), retrying")
+                time.sleep(JOB_POLL_S * 2 ** attempt)
+                # the rollback dropped the pending row: stage a fresh one
+                row = stage_result(db, file_path, response, model_answer_id)
+
+        if not done:
+            print(f"⚠️ Job {job_id} was taken over by another worker, dropping this result")
+            return
+
+    remove_upload(file_path)
+
+
+def _complete_job(db: Session, job_id: int, worker_id: str, row, response: dict) -> bool:
+    # the Result row and the job's completion commit together, and only
+    # if the job was not requeued to another worker while this one ran
+    db.flush()
+    done = _owned(db, job_id, worker_id).update({
+        "state": "done",
+        "result_id": row.id,
+        "response_json": json.dumps(response),
+        "error": None,
+        "finished_at": datetime.utcnow(),
+    }, synchronize_session=False)
+    if not done:
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+
+def work_loop(worker_id: str, stop: threading.Event = None):
+    """
+    Drain the queue until `stop` is set: claim, evaluate, repeat; sleep
+    JOB_POLL_S when idle. Every worker also sweeps for stale jobs. A DB
+    error (e.g. "database is locked") is logged and the loop backs off
+    instead of the worker dying; a job it interrupted is requeued by the
+    stale sweep.
+    """
+    last_sweep = 0.0
+    errors = 0
+    while stop is None or not stop.is_set():
+        job = None
+        db = SessionLocal()
+        try:
+            if time.time() - last_sweep >= JOB_HEARTBEAT_S:
+                requeue_stale(db)
+                last_sweep = time.time()
+
+            job = claim_job(db, worker_id)
+            if job is not None:
+                run_job(db, job)
+            errors = 0
+        except Exception as e:
+            db.rollback()
+            errors += 1
+            delay = min(JOB_POLL_S * 2 ** errors, _MAX_ERROR_SLEEP_S)
+            print(f"⚠️ Job worker {worker_id}: {e}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        finally:
+            db.close()
+
+        if job is None:
+            time.sleep(JOB_POLL_S)
+
+
+def job_status(job: EvalJob) -> dict:
+    return {
+        "job_id": job.id,
+        "state": job.state,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": json.loads(job.error) if job.error else None,
+        "result_id": job.result_id,
+        "result": json.loads(job.response_json) if job.response_json else None,
+    }
+
+
+def get_job_metrics(db: Session) -> dict:
+    now = datetime.utcnow()
+    counts = dict(db.query(EvalJob.state, func.count(EvalJob.id)).group_by(EvalJob.state).all())
+
+    oldest = db.query(func.min(EvalJob.created_at)).filter(EvalJob.state == "queued").scalar()
+
+    recent = (
+        db.query(EvalJob.started_at, EvalJob.finished_at)
+        .filter(EvalJob.state == "done", EvalJob.finished_at >= now - timedelta(minutes=5))
+        .all()
+    )
+    durations = [(f - s).total_seconds() for s, f in recent if s and f]
+
+    return {
+        "queue_depth": counts.get("queued", 0),
+        "running": counts.get("running", 0),
+        "by_state": counts,
+        "oldest_queued_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0.0,
+        "done_last_5min": len(recent),
+        "throughput_per_min": round(len(recent) / 5, 2),
+        "avg_run_seconds": round(sum(durations) / len(durations), 2) if durations else 0.0,
+    }
@@ -1,42 +1,79 @@
 import cv2
 import numpy as np
-import os
 
+from services.image_io import as_image, debug_dump
 
-def split_into_lines(image_path: str, out_dir="uploads/lines"):
-    os.makedirs(out_dir, exist_ok=True)
 
-    img = cv2.imread(image_path)
-    if img is None:
-        return []
-
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+def binarize_ink(img):
+    """
+    Inverted Otsu mask (ink = 255) with small specks removed.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
 
     # invert
     _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
 
     kernel = np.ones((2, 2), np.uint8)
-    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+    return cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+
+
+def find_text_bands(projection, min_value=10, min_length=10):
+    """
+    Runs of `projection > min_value`, as (start, end) pairs.
+    Closed runs must be longer than `min_length`; a run touching the end of
+    the profile is kept as-is and ends at the last index.
+    """
+    projection = np.asarray(projection)
+    n = len(projection)
+    if n == 0:
+        return []
+
+    active = (projection > min_value).astype(np.int8)
+    edges = np.diff(np.concatenate(([0], active, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    open_run = ends == n
+    keep = open_run | ((ends - starts) > min_length)
+    ends = np.where(open_run, n - 1, ends)
+
+    return [(int(s), int(e)) for s, e in zip(starts[keep], ends[keep])]
 
-    projection = np.sum(thresh, axis=1)
 
-    lines = []
-    start = None
+def detect_boxes_projection(img, min_height=15):
+    """
+    Model-free line detector: one (x1, y1, x2, y2) box per horizontal ink band,
+    spanning the columns that contain ink inside that band.
+    """
+    thresh = binarize_ink(img)
+    bands = find_text_bands(np.sum(thresh, axis=1))
 
-    for i, val in enumerate(projection):
-        if val > 10 and start is None:
-            start = i
-        elif val <= 10 and start is not None:
-            end = i
-            if end - start > 10:
-                lines.append((start, end))
-            start = None
+    boxes = []
+    for (y1, y2) in bands:
+        if y2 - y1 < min_height:
+            continue
+
+        cols = np.flatnonzero(thresh[y1:y2].any(axis=0))
+        if cols.size == 0:
+            continue
+
+        boxes.append((int(cols[0]), y1, int(cols[-1]) + 1, y2))
+
+    return boxes
+
+
+def split_into_lines(image):
+    """
+    Full-width line crops (views into the page) for a path or BGR array.
+    """
+    img = as_image(image)
+    if img is None:
+        return []
 
-    if start is not None:
-        lines.append((start, len(projection) - 1))
+    thresh = binarize_ink(img)
+    lines = find_text_bands(np.sum(thresh, axis=1))
 
-    saved_paths = []
-    line_index = 0
+    crops = []
 
     for (y1, y2) in lines:
         crop = img[y1:y2, :]
@@ -44,9 +81,7 @@ def split_into_lines(image_path: str, out_dir="uploads/lines"):
         if crop.shape[0] < 15:
             continue
 
-        save_path = os.path.join(out_dir, f"line_{line_index}.png")
-        cv2.imwrite(save_path, crop)
-        saved_paths.append(save_path)
-        line_index += 1
+        debug_dump(crop, f"line_{len(crops)}")
+        crops.append(crop)
 
-    return saved_paths
+    return crops
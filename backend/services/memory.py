@@ -0,0 +1,28 @@
+import os
+
+
+def process_memory(pid="self") -> dict:
+    """
+    RSS and PSS (MB) of a process from /proc. PSS splits pages shared with
+    other processes (e.g. copy-on-write model weights after fork) between
+    them, so summing PSS over the workers gives the real footprint.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] in ("Rss:", "Pss:", "Shared_Clean:", "Shared_Dirty:"):
+                    fields[parts[0][:-1].lower()] = round(int(parts[1]) / 1024, 1)
+    except OSError:
+        # no /proc (macOS / Windows): peak RSS of this process where the
+        # Unix-only resource module exists, nothing on Windows
+        if pid == "self":
+            try:
+                import resource
+            except ImportError:
+                pass
+            else:
+                fields["max_rss"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    return {"pid": os.getpid() if pid == "self" else pid, "mb": fields}
@@ -0,0 +1,71 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from config import APP_MODE, OCR_DEFAULT_TIER, OCR_USES_EASYOCR
+
+# per-model load state: not_loaded -> loading -> ready | failed
+_states = {}
+_states_lock = threading.Lock()
+
+# models a full-mode worker needs before it is ready to evaluate
+REQUIRED_MODELS = ()
+if APP_MODE == "full":
+    REQUIRED_MODELS = (("easyocr",) if OCR_USES_EASYOCR else ()) + (f"trocr-{OCR_DEFAULT_TIER}", "embedder")
+
+for _name in REQUIRED_MODELS:
+    _states[_name] = {"state": "not_loaded"}
+
+
+@contextmanager
+def loading(name: str):
+    """
+    Wrap a model load so its state and load time show up in /health/ready.
+    """
+    start = time.perf_counter()
+    with _states_lock:
+        _states[name] = {"state": "loading"}
+
+    try:
+        yield
+    except Exception as e:
+        with _states_lock:
+            _states[name] = {"state": "failed", "error": str(e)}
+        raise
+
+    with _states_lock:
+        _states[name] = {"state": "ready", "load_seconds": round(time.perf_counter() - start, 2)}
+
+
+def get_model_states() -> dict:
+    with _states_lock:
+        models = {name: dict(state) for name, state in _states.items()}
+
+    ready = all(models[name]["state"] == "ready" for name in REQUIRED_MODELS)
+    return {"mode": APP_MODE, "ready": ready, "models": models}
+
+
+def warm_up():
+    """
+    Load the default models. Imports are local so API-only workers never
+    pull in the inference stacks.
+    """
+    from services.embeddings import get_embedder
+    from services.hybrid_ocr import get_easy_reader, get_tier_backend
+
+    loaders = [lambda: get_tier_backend(OCR_DEFAULT_TIER), get_embedder]
+    if OCR_USES_EASYOCR:
+        loaders.insert(0, get_easy_reader)
+
+    for load in loaders:
+        try:
+            load()
+        except Exception as e:
+            # state is already "failed"; the next request retries the load
+            print(f"⚠️ Model warm-up failed: {e}")
+
+
+def start_warm_up():
+    thread = threading.Thread(target=warm_up, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
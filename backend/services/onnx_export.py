@@ -0,0 +1,48 @@
+import shutil
+from pathlib import Path
+
+
+def _quantize_onnx(src_dir: Path, out_dir: Path):
+    """
+    Dynamic int8 quantisation of every graph in `src_dir`. Weights become
+    int8, activations are quantised at run time, so no calibration set is needed.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    shutil.copytree(src_dir, out_dir, ignore=shutil.ignore_patterns("*.onnx", "*.onnx_data"))
+    for graph in src_dir.glob("*.onnx"):
+        quantize_dynamic(graph, out_dir / graph.name, weight_type=QuantType.QInt8)
+
+
+def prepare_onnx_model(model_id: str, cache_dir: str, quantize: bool,
+                       ort_model_cls, preprocessor_cls, **export_kwargs) -> Path:
+    """
+    Export `model_id` (hub id or local folder) with the given optimum ORT
+    class once, optionally quantise it, and reuse the files afterwards.
+    Returns the folder to load the ORT model from.
+    """
+    root = Path(cache_dir) / model_id.strip("/").replace("/", "--")
+    fp32_dir = root / "fp32"
+    int8_dir = root / "int8"
+
+    if not (fp32_dir / "config.json").exists():
+        model = ort_model_cls.from_pretrained(model_id, export=True, **export_kwargs)
+        model.save_pretrained(fp32_dir)
+        preprocessor_cls.from_pretrained(model_id).save_pretrained(fp32_dir)
+
+    if not quantize:
+        return fp32_dir
+
+    if not (int8_dir / "config.json").exists():
+        _quantize_onnx(fp32_dir, int8_dir)
+
+    return int8_dir
+
+
+def session_options(threads: int = 0):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    return options
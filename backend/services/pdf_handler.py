@@ -1,28 +1,45 @@
-import os
+import cv2
 import fitz  # PyMuPDF
-from config import UPLOAD_DIR
+import numpy as np
 
+from config import OCR_MAX_DECODE_PIXELS
+from services.image_io import debug_dump, resize_to_max_pixels
+
+
+def _pixmap_to_bgr(pix):
+    arr = np.frombuffer(pix.samples, dtype=np.uint8)
+    arr = arr.reshape(pix.height, pix.stride)[:, :pix.width * pix.n]
+    arr = arr.reshape(pix.height, pix.width, pix.n)
+
+    if pix.n == 1:
+        return cv2.cvtColor(arr, cv2.COLOR_GRAY2BGR)
+    if pix.n == 4:
+        return cv2.cvtColor(arr, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
 
-def pdf_to_images(pdf_path: str) -> list:
-    """
-    Converts PDF pages into images.
-    Returns list of image paths.
-    """
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-    doc = fitz.open(pdf_path)
-    paths = []
+def page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
 
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        pix = page.get_pixmap(dpi=200)
 
-        out_path = os.path.join(
-            UPLOAD_DIR,
-            f"page_{page_num+1}_{os.path.basename(pdf_path)}.png"
-        )
+def render_page(pdf_path: str, page_num: int, dpi: int = 200,
+                max_pixels: int = OCR_MAX_DECODE_PIXELS):
+    """
+    Render one page (0-based) to a BGR array, capped like decoded uploads.
+    Opening the document per page keeps workers independent of each other.
+    """
+    with fitz.open(pdf_path) as doc:
+        pix = doc[page_num].get_pixmap(dpi=dpi, alpha=False)
+
+    img = resize_to_max_pixels(_pixmap_to_bgr(pix), max_pixels)
+    debug_dump(img, f"page_{page_num + 1}")
+    return img
 
-        pix.save(out_path)
-        paths.append(out_path)
 
-    return paths
+def pdf_to_images(pdf_path: str, dpi: int = 200) -> list:
+    """
+    Renders PDF pages straight into memory.
+    Returns a list of BGR arrays, one per page.
+    """
+    return [render_page(pdf_path, n, dpi) for n in range(page_count(pdf_path))]
@@ -1,16 +1,20 @@
-import os
+import cv2
+import numpy as np
 from pdf2image import convert_from_path
 
+from services.image_io import debug_dump
 
-def pdf_to_images(pdf_path: str, out_dir="uploads/pdf_pages"):
-    os.makedirs(out_dir, exist_ok=True)
 
-    pages = convert_from_path(pdf_path, dpi=300)
+def pdf_to_images(pdf_path: str, dpi: int = 300):
+    """
+    pdf2image renderer; returns one BGR array per page, nothing is written.
+    """
+    pages = convert_from_path(pdf_path, dpi=dpi)
 
-    image_paths = []
+    images = []
     for i, page in enumerate(pages):
-        img_path = os.path.join(out_dir, f"page_{i}.png")
-        page.save(img_path, "PNG")
-        image_paths.append(img_path)
+        img = cv2.cvtColor(np.asarray(page.convert("RGB")), cv2.COLOR_RGB2BGR)
+        debug_dump(img, f"page_{i}")
+        images.append(img)
 
-    return image_paths
+    return images
@@ -1,11 +1,18 @@
 import cv2
 import numpy as np
 
-def preprocess_for_ocr(image_path: str) -> str:
-    img = cv2.imread(image_path)
+from services.image_io import as_image, debug_dump
+
+
+def preprocess_for_ocr(image):
+    """
+    Contrast-normalised, thresholded copy of `image` (path or BGR array).
+    Returns the processed array, or None if the image cannot be read.
+    """
+    img = as_image(image)
 
     if img is None:
-        return image_path
+        return None
 
     # Convert to grayscale
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -25,8 +32,6 @@ def preprocess_for_ocr(image_path: str) -> str:
         10
     )
 
-    # Save processed image
-    out_path = image_path.replace(".", "_clean.")
-    cv2.imwrite(out_path, thresh)
+    debug_dump(thresh, "clean")
 
-    return out_path
+    return thresh
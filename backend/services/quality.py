@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+from config import (
+    QUALITY_INK_DELTA,
+    QUALITY_MAX_DIM,
+    QUALITY_MIN_BRIGHTNESS,
+    QUALITY_MIN_CONTRAST,
+    QUALITY_MIN_INK,
+    QUALITY_MIN_SHARPNESS,
+)
+from services.image_io import resize_to_max_dim
+
+MESSAGES = {
+    "unreadable": "The image could not be decoded.",
+    "too_dark": "The sheet is too dark. Retake the photo in better light.",
+    "low_contrast": "The sheet has almost no contrast. Retake the photo.",
+    "blank": "No handwriting was found on the sheet.",
+    "blurry": "The photo is too blurry to read. Hold the camera steady and retake it.",
+}
+
+
+def _report(reason, metrics):
+    return {
+        "ok": reason is None,
+        "reason": reason,
+        "message": MESSAGES.get(reason, ""),
+        "metrics": metrics,
+    }
+
+
+def assess_quality(img) -> dict:
+    """
+    Cheap pre-flight check before any OCR model runs. Works on a copy no
+    larger than QUALITY_MAX_DIM, so it takes milliseconds on any upload.
+
+    Returns {"ok", "reason", "message", "metrics"}; `reason` is None for
+    usable sheets, otherwise one of the MESSAGES keys.
+    """
+    if img is None or img.size == 0:
+        return _report("unreadable", {})
+
+    small, _ = resize_to_max_dim(img, QUALITY_MAX_DIM)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    brightness = float(gray.mean())
+
+    paper = float(np.percentile(gray, 90))
+    dynamic_range = max(paper - float(np.percentile(gray, 1)), 1.0)
+
+    ink_mask = gray < paper - QUALITY_INK_DELTA
+    ink_density = float(ink_mask.mean())
+    # marks that are darker than the paper, but too faint to count as ink
+    faint_density = float((gray < paper - QUALITY_MIN_CONTRAST).mean())
+
+    # Laplacian response along stroke edges, relative to the ink contrast:
+    # sharp strokes keep it high regardless of how much is written
+    sharpness = 0.0
+    if ink_mask.any():
+        edges = cv2.dilate(ink_mask.astype(np.uint8), np.ones((3, 3), np.uint8)) > 0
+        lap = np.abs(cv2.Laplacian(gray, cv2.CV_32F))
+        sharpness = float(np.percentile(lap[edges], 90)) / dynamic_range
+
+    metrics = {
+        "brightness": round(brightness, 2),
+        "contrast": round(dynamic_range, 2),
+        "ink_density": round(ink_density, 5),
+        "faint_density": round(faint_density, 5),
+        "sharpness": round(sharpness, 4),
+    }
+
+    if brightness < QUALITY_MIN_BRIGHTNESS:
+        return _report("too_dark", metrics)
+    # the ink test comes first: global contrast mostly measures how much is
+    # written, so a short answer would fail it and a white page would not
+    # be called blank. Without ink, faint marks mean a washed-out photo.
+    if ink_density < QUALITY_MIN_INK:
+        if faint_density >= QUALITY_MIN_INK:
+            return _report("low_contrast", metrics)
+        return _report("blank", metrics)
+    if sharpness < QUALITY_MIN_SHARPNESS:
+        return _report("blurry", metrics)
+
+    return _report(None, metrics)
@@ -1,13 +1,16 @@
-from sentence_transformers import SentenceTransformer, util
-
-# multilingual SBERT model (works for many languages)
-embedder = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+from services.embeddings import encode_texts
 
 # 🔥 If similarity below this, answer is considered NOT RELATED
 NOT_RELATED_THRESHOLD = 0.22
 
 
-def semantic_score(student_text: str, model_text: str) -> float:
+def semantic_score(student_text: str, model_text: str, model_side: dict = None,
+                   student_side: dict = None) -> float:
+    """
+    0-100 score. `model_side` / `student_side` are precomputed embeddings
+    (services.embeddings.get_model_answer_embeddings / encode_evaluation);
+    whatever is missing is encoded here.
+    """
     student_text = (student_text or "").strip()
     model_text = (model_text or "").strip()
 
@@ -15,11 +18,26 @@ def semantic_score(student_text: str, model_text: str) -> float:
         return 0.0
 
     # Embeddings
-    emb1 = embedder.encode(student_text, convert_to_tensor=True)
-    emb2 = embedder.encode(model_text, convert_to_tensor=True)
+    if student_side is not None:
+        emb1 = student_side["text_emb"]
+    else:
+        emb1 = encode_texts([student_text])[0]
+    if model_side is not None:
+        emb2 = model_side["text_emb"]
+    else:
+        emb2 = encode_texts([model_text])[0]
 
     # Similarity (0 to 1)
-    sim = util.cos_sim(emb1, emb2).item()
+    import torch
+    sim = torch.nn.functional.cosine_similarity(emb1, emb2, dim=-1).item()
+
+    return score_from_similarity(sim, student_text, model_text)
+
+
+def score_from_similarity(sim: float, student_text: str, model_text: str) -> float:
+    """
+    Turn a cosine similarity into the 0-100 score.
+    """
     sim = max(0.0, min(sim, 1.0))
 
     # ✅ If not related, give 0 score
@@ -0,0 +1,76 @@
+import re
+from typing import Dict, List, Optional
+
+
+def _marker_pattern(marker: str):
+    # "Q 1", "q1" and "Q1" all match the marker "Q1"
+    chars = [ch for ch in marker.strip() if not ch.isspace()]
+    body = r"\s*".join(re.escape(ch) for ch in chars)
+
+    # whole markers only: "Q1" must not match inside "Q10" or "AQ1",
+    # and "1" must not cut "12" in half
+    prefix = r"(?<![A-Za-z0-9])" if chars and chars[0].isalnum() else ""
+    suffix = ""
+    if chars and chars[-1].isdigit():
+        suffix = r"(?!\d)"
+    elif chars and chars[-1].isalpha():
+        suffix = r"(?![A-Za-z])"
+
+    return re.compile(prefix + body + suffix, re.IGNORECASE)
+
+
+def split_by_markers(text: str, markers: List[str]) -> List[str]:
+    """
+    Cut `text` into one segment per marker (e.g. "Q1", "Q2", "Ans 3").
+    A segment runs from the end of its marker to the start of the next
+    marker found after it. Markers that cannot be found get "".
+    """
+    text = text or ""
+    found = []  # (start, end, question index)
+    pos = 0
+
+    for idx, marker in enumerate(markers):
+        m = _marker_pattern(marker).search(text, pos)
+        if m:
+            found.append((m.start(), m.end(), idx))
+            pos = m.end()
+
+    segments = [""] * len(markers)
+    for k, (start, end, idx) in enumerate(found):
+        stop = found[k + 1][0] if k + 1 < len(found) else len(text)
+        segments[idx] = text[end:stop].strip(" \n:.-)")
+
+    return segments
+
+
+def split_lines_by_regions(lines: List[Dict], regions: List[List[float]],
+                           page_w: int, page_h: int) -> List[str]:
+    """
+    Group OCR lines into per-question texts by region hint. Regions are
+    [x1, y1, x2, y2] as fractions of the page size, so they stay valid when
+    the page was downscaled on load. A line belongs to the first region
+    containing its centre.
+    """
+    buckets = [[] for _ in regions]
+
+    for line in lines:
+        x1, y1, x2, y2 = line["box"]
+        cx = (x1 + x2) / 2 / max(page_w, 1)
+        cy = (y1 + y2) / 2 / max(page_h, 1)
+
+        for idx, (rx1, ry1, rx2, ry2) in enumerate(regions):
+            if rx1 <= cx <= rx2 and ry1 <= cy <= ry2:
+                buckets[idx].append(line["text"])
+                break
+
+    return ["\n".join(texts) for texts in buckets]
+
+
+def segment_answers(text: str, markers: List[Optional[str]]) -> List[str]:
+    """
+    Per-question texts from marker hints. A single question without a
+    marker gets the whole text.
+    """
+    if len(markers) == 1 and not markers[0]:
+        return [text or ""]
+    return split_by_markers(text, markers)
@@ -1,4 +1,5 @@
 import re
+from typing import List
 
 def clean_text(text: str) -> str:
     if not text:
@@ -23,3 +24,25 @@ def clean_text(text: str) -> str:
     text = re.sub(r"\s+", " ", text).strip()
 
     return text
+
+
+def _clean_text(text: str) -> str:
+    text = (text or "").strip()
+    text = re.sub(r"\s+", " ", text)
+    return text
+
+
+def split_sentences(text: str) -> List[str]:
+    text = _clean_text(text)
+    if not text:
+        return []
+
+    parts = re.split(r"(?<=[.!?])\s+|\n+", text)
+
+    sentences = []
+    for s in parts:
+        s = s.strip()
+        if len(s) >= 12:
+            sentences.append(s)
+
+    return sentences
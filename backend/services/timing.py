@@ -0,0 +1,16 @@
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def stage(timings, name: str):
+    """
+    Add the wall time of the block to timings[name] (seconds).
+    `timings` may be None, in which case nothing is recorded.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
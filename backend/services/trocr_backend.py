@@ -0,0 +1,75 @@
+from services.onnx_export import prepare_onnx_model, session_options
+
+
+# -----------------------------
+# PyTorch (reference) backend
+# -----------------------------
+
+class TorchTrOCRBackend:
+    """
+    fp32 VisionEncoderDecoderModel, as shipped on the hub.
+    """
+    name = "torch"
+
+    def __init__(self, model_id: str, device: str = None):
+        import torch
+        from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.processor = TrOCRProcessor.from_pretrained(model_id)
+        self.model = VisionEncoderDecoderModel.from_pretrained(model_id).to(self.device)
+        self.model.eval()
+
+    def recognise(self, images, max_new_tokens: int = 128):
+        import torch
+
+        pixel_values = self.processor(images=images, return_tensors="pt").pixel_values.to(self.device)
+
+        with torch.inference_mode():
+            generated_ids = self.model.generate(pixel_values, max_new_tokens=max_new_tokens)
+
+        return [t.strip() for t in self.processor.batch_decode(generated_ids, skip_special_tokens=True)]
+
+
+# -----------------------------
+# ONNX Runtime backend
+# -----------------------------
+
+class OnnxTrOCRBackend:
+    """
+    TrOCR through ONNX Runtime with KV-cache decoding, optionally int8.
+    Needs `optimum[onnxruntime]`.
+    """
+
+    def __init__(self, model_id: str, cache_dir: str, quantize: bool = True, threads: int = 0):
+        from optimum.onnxruntime import ORTModelForVision2Seq
+        from transformers import TrOCRProcessor
+
+        self.name = "onnx-int8" if quantize else "onnx"
+
+        # encoder, decoder and decoder-with-past (KV cache) graphs
+        model_dir = prepare_onnx_model(
+            model_id, cache_dir, quantize, ORTModelForVision2Seq, TrOCRProcessor, use_cache=True
+        )
+
+        self.processor = TrOCRProcessor.from_pretrained(model_dir)
+        self.model = ORTModelForVision2Seq.from_pretrained(
+            model_dir, use_cache=True, session_options=session_options(threads)
+        )
+
+    def recognise(self, images, max_new_tokens: int = 128):
+        pixel_values = self.processor(images=images, return_tensors="pt").pixel_values
+
+        generated_ids = self.model.generate(pixel_values, max_new_tokens=max_new_tokens)
+
+        return [t.strip() for t in self.processor.batch_decode(generated_ids, skip_special_tokens=True)]
+
+
+def load_trocr_backend(kind: str, model_id: str, onnx_dir: str = "models/onnx",
+                       quantize: bool = True, threads: int = 0):
+    if kind == "torch":
+        return TorchTrOCRBackend(model_id)
+    if kind == "onnx":
+        return OnnxTrOCRBackend(model_id, onnx_dir, quantize=quantize, threads=threads)
+
+    raise ValueError(f"Unknown OCR backend: {kind}")
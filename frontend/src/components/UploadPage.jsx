@@ -30,7 +30,8 @@ export default function UploadPage() {
 
       setOutput(evalRes.data);
     } catch (err) {
-      alert(err?.response?.data?.detail || "Evaluation failed");
+      const detail = err?.response?.data?.detail;
+      alert(detail?.message || detail || "Evaluation failed");
     }
   }
 